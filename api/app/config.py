@@ -59,6 +59,8 @@ class Settings(BaseSettings):
     AMADEUS_API_SECRET: str = Field(default="")
     # Use True for sandbox/test API, False for production API
     AMADEUS_USE_TEST_API: bool = Field(default=True)
+    # Max concurrent Amadeus requests per market insights sync
+    AMADEUS_MAX_CONCURRENCY: int = Field(default=8)
     
     @computed_field
     @property
@@ -30,6 +30,7 @@ from app.utils.database import init_db, close_db, AsyncSessionLocal
 from app.utils.redis import init_redis, close_redis
 from app.utils.mongodb import init_mongodb, close_mongodb
 from app.services.airport_cache import AirportCacheService
+from app.services.providers import provider_manager
 
 # Configure logging
 logging.basicConfig(
@@ -76,6 +77,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Flightshark API...")
     
+    await provider_manager.close()
     await close_db()
     await close_redis()
     await close_mongodb()
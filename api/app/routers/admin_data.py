@@ -332,6 +332,8 @@ async def seed_from_openflights(
                 started_at=started_at
             )
             raise
+        finally:
+            await fetcher.close()
     
     if background_tasks:
         background_tasks.add_task(seed_task)
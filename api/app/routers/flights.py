@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List, Literal
 from datetime import date, datetime
+from operator import itemgetter
 import logging
 
 from app.config import settings
@@ -201,7 +202,7 @@ async def get_cheapest_dates(
         "destination": destination.upper(),
         "month": f"{year}-{month:02d}",
         "dates": cheapest_dates,
-        "cheapest_date": min(cheapest_dates, key=lambda x: x["price"]) if cheapest_dates else None
+        "cheapest_date": min(cheapest_dates, key=itemgetter("price")) if cheapest_dates else None
     }
     
     # Cache for 1 hour
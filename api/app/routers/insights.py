@@ -15,6 +15,9 @@ from app.services.market_insights_service import MarketInsightsService
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Upper bound on origins accepted by /trending/batch
+MAX_BATCH_ORIGINS = 20
+
 
 # =========================================================================
 # PUBLIC ENDPOINTS - Read cached/stored data
@@ -160,9 +163,58 @@ async def get_trending_destinations(
     service = MarketInsightsService(db, cache)
     
     data = await service.get_trending(origin.upper(), limit)
+    _add_trend_labels(data)
+    
+    return {
+        "origin": origin.upper(),
+        "destinations": data,
+        "total": len(data),
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+@router.get("/trending/batch")
+async def get_trending_destinations_batch(
+    origins: str = Query(..., description="Comma-separated origin codes, e.g. DUB,LHR,GLOBAL"),
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    cache = Depends(get_redis),
+):
+    """
+    Get trending destinations for several origins in one request.
+    
+    Same data as `/trending`, keyed by origin. Cache lookups for all
+    origins share a single Redis round trip.
+    
+    **Use cases:**
+    - Homepage sections that show trending lists for several cities
+    """
+    codes = list(dict.fromkeys(
+        code.strip().upper() for code in origins.split(",") if code.strip()
+    ))
+    if not codes:
+        raise HTTPException(400, "At least one origin is required")
+    if len(codes) > MAX_BATCH_ORIGINS:
+        raise HTTPException(400, f"At most {MAX_BATCH_ORIGINS} origins per request")
+    
+    service = MarketInsightsService(db, cache)
+    
+    data = await service.get_trending_many(codes, limit)
+    for destinations in data.values():
+        _add_trend_labels(destinations)
     
-    # Categorize trending direction
-    for dest in data:
+    return {
+        "origins": {
+            origin: {"destinations": destinations, "total": len(destinations)}
+            for origin, destinations in data.items()
+        },
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+def _add_trend_labels(destinations: List[dict]):
+    """Categorize trending direction from week-over-week score change"""
+    for dest in destinations:
         if dest["score_change"] > 5:
             dest["trend"] = "hot"
         elif dest["score_change"] > 0:
@@ -171,13 +223,6 @@ async def get_trending_destinations(
             dest["trend"] = "cooling"
         else:
             dest["trend"] = "stable"
-    
-    return {
-        "origin": origin.upper(),
-        "destinations": data,
-        "total": len(data),
-        "updated_at": datetime.utcnow().isoformat(),
-    }
 
 
 @router.get("/popular-routes")
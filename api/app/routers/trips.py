@@ -7,6 +7,8 @@ from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from datetime import date
+from operator import attrgetter
+import asyncio
 import logging
 
 from app.utils.database import get_db
@@ -254,23 +256,33 @@ async def search_group_flights(
             detail="No origin airports set for trip members"
         )
     
-    # Search flights for each origin to destination
+    # Search flights for each origin to destination concurrently
     flight_service = FlightService()
     
+    search_results = await asyncio.gather(
+        *[
+            flight_service.search_flights(
+                origin=origin,
+                destination=trip.destination_code,
+                departure_date=trip.departure_date,
+                return_date=trip.return_date,
+                passengers=1,
+            )
+            for origin in origins
+        ],
+        return_exceptions=True,
+    )
+    
     group_results = []
     total_min_price = 0
     
-    for origin in origins:
-        offers = await flight_service.search_flights(
-            origin=origin,
-            destination=trip.destination_code,
-            departure_date=trip.departure_date,
-            return_date=trip.return_date,
-            passengers=1,
-        )
+    for origin, offers in zip(origins, search_results):
+        if isinstance(offers, Exception):
+            logger.warning(f"Group flight search failed for {origin}: {offers}")
+            offers = []
         
         if offers:
-            cheapest = min(offers, key=lambda x: x.price)
+            cheapest = min(offers, key=attrgetter("price"))
             group_results.append({
                 "origin": origin,
                 "destination": trip.destination_code,
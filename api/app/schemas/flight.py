@@ -1,8 +1,8 @@
 """
 Flight Schemas
 """
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Optional, List, Tuple
 from datetime import date, datetime
 
 
@@ -41,6 +41,9 @@ class FlightOffer(BaseModel):
     # Kiwi-specific: virtual interlining connects flights on different airlines
     virtual_interlining: bool = False
     
+    # Dedup signature memoized by ProviderManager (never serialized)
+    _signature: Optional[Tuple] = PrivateAttr(default=None)
+    
     class Config:
         from_attributes = True
 
@@ -3,7 +3,8 @@ Airport Cache Service - Preloads airports into Redis for instant search
 """
 import json
 import logging
-from typing import List, Optional, Dict, Any
+from operator import itemgetter
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -15,8 +16,12 @@ logger = logging.getLogger(__name__)
 # Cache keys
 AIRPORTS_ALL_KEY = "airports:all"  # Hash of all airports by code
 AIRPORTS_INDEX_KEY = "airports:search_index"  # Pre-built search index
-AIRPORTS_LOADED_KEY = "airports:loaded"  # Flag indicating cache is loaded
+AIRPORTS_LOADED_KEY = "airports:loaded:v2"  # Flag indicating cache is loaded (bump when entry shape changes)
 AIRPORTS_VERSION_KEY = "airports:version"  # Version for cache invalidation
+AIRPORTS_POPULAR_KEY = "airports:popular"  # Hash of precomputed popular lists by country ("all" = global)
+
+# Max popular airports stored per country (matches the /airports/popular/ limit cap)
+POPULAR_AIRPORTS_MAX = 100
 
 
 class AirportCacheService:
@@ -66,27 +71,37 @@ class AirportCacheService:
             # Build the cache data structures
             airports_hash = {}  # code -> airport data
             search_entries = []  # For building search index
+            popular_all: List[Dict[str, Any]] = []  # major airports, all countries
+            popular_by_country: Dict[str, List[Dict[str, Any]]] = {}  # country -> major airports
             
             for airport in airports:
-                airport_data = AirportCacheService._airport_to_dict(airport)
-                airports_hash[airport.iata_code] = json.dumps(airport_data)
-                
                 # Build search index entries
                 # We'll index by: code, city (lowercase), name words
                 code = airport.iata_code.upper()
                 city_lower = airport.city.lower()
                 name_lower = airport.name.lower()
                 
+                airport_data = AirportCacheService._airport_to_dict(airport)
+                airports_hash[airport.iata_code] = json.dumps(airport_data)
+                
                 # Create search entry with all searchable terms
                 search_entry = {
                     "code": code,
                     "city": city_lower,
+                    # Precomputed grouping key (city+country) used by _group_airports_by_city
+                    "city_key": f"{city_lower}|{airport.country_code.upper()}",
                     "name": name_lower,
                     "country": airport.country.lower(),
                     "is_major": airport.is_major,
                     "data": airport_data,
                 }
                 search_entries.append(search_entry)
+                
+                if airport.is_major:
+                    popular_all.append(airport_data)
+                    # Unmapped countries are stored as "" and get no per-country list
+                    if airport.country_code:
+                        popular_by_country.setdefault(airport.country_code.upper(), []).append(airport_data)
             
             # Store in Redis using pipeline for efficiency
             pipe = cache.pipeline()
@@ -94,6 +109,7 @@ class AirportCacheService:
             # Clear existing data
             pipe.delete(AIRPORTS_ALL_KEY)
             pipe.delete(AIRPORTS_INDEX_KEY)
+            pipe.delete(AIRPORTS_POPULAR_KEY)
             
             # Store all airports hash
             if airports_hash:
@@ -102,6 +118,16 @@ class AirportCacheService:
             # Store search index as JSON list (for in-memory search)
             pipe.set(AIRPORTS_INDEX_KEY, json.dumps(search_entries))
             
+            # Store precomputed popular airport lists so lookups are a single HGET.
+            # Sorted by city in Python (stable over the DB order) so the order is
+            # code-point based as before, not whatever the database collation gives.
+            popular_fields = {
+                country: json.dumps(AirportCacheService._popular_list(entries))
+                for country, entries in popular_by_country.items()
+            }
+            popular_fields["all"] = json.dumps(AirportCacheService._popular_list(popular_all))
+            pipe.hset(AIRPORTS_POPULAR_KEY, mapping=popular_fields)
+            
             # Set loaded flag with TTL (refresh daily)
             pipe.setex(AIRPORTS_LOADED_KEY, 86400, "1")  # 24 hours
             pipe.set(AIRPORTS_VERSION_KEY, str(len(airports)))
@@ -208,18 +234,18 @@ class AirportCacheService:
                     if entry["is_major"]:
                         score += 50
                     
-                    results.append((score, entry["data"]))
+                    results.append((score, entry["city_key"], entry["data"]))
                     seen_codes.add(code)
             
             # Sort by score (descending)
             results.sort(key=lambda x: x[0], reverse=True)
             
             if not group_by_city:
-                return [r[1] for r in results[:limit]]
+                return [r[2] for r in results[:limit]]
             
             # Group by city for multi-airport cities
             return AirportCacheService._group_airports_by_city(
-                [r[1] for r in results], 
+                [(r[1], r[2]) for r in results], 
                 limit
             )
             
@@ -227,39 +253,39 @@ class AirportCacheService:
             logger.error(f"Airport search error: {e}", exc_info=True)
             return []
     
+    @staticmethod
+    def _popular_list(airports: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sort major airports by city and cap them at POPULAR_AIRPORTS_MAX"""
+        return sorted(airports, key=itemgetter("city"))[:POPULAR_AIRPORTS_MAX]
+    
     @staticmethod
     def _group_airports_by_city(
-        airports: List[Dict[str, Any]], 
+        airports: List[Tuple[str, Dict[str, Any]]], 
         limit: int
     ) -> List[Dict[str, Any]]:
         """
         Group airports by city for multi-airport cities.
         
+        airports are (city_key, airport) pairs, city_key coming from the
+        search index so the returned airport dicts stay unchanged.
+        
         Returns a mix of:
         - City groups (for cities with 2+ airports): { type: "city", city: "London", airports: [...] }
         - Individual airports (for cities with 1 airport): { type: "airport", ... }
         """
-        from collections import defaultdict
-        
-        # Group airports by city+country (to handle same city names in different countries)
-        city_airports = defaultdict(list)
-        for airport in airports:
-            city_key = f"{airport['city'].lower()}|{airport['country_code']}"
-            city_airports[city_key].append(airport)
+        # Group airports by city+country (to handle same city names in different countries).
+        # Dict insertion order keeps groups in the order their first airport appears.
+        city_airports: Dict[str, List[Dict[str, Any]]] = {}
+        for city_key, airport in airports:
+            city_airports.setdefault(city_key, []).append(airport)
         
         results = []
-        seen_cities = set()
         
-        for airport in airports:
+        for city_group in city_airports.values():
             if len(results) >= limit:
                 break
-                
-            city_key = f"{airport['city'].lower()}|{airport['country_code']}"
-            
-            if city_key in seen_cities:
-                continue
             
-            city_group = city_airports[city_key]
+            airport = city_group[0]
             
             if len(city_group) >= 2:
                 # Multi-airport city - create a city group
@@ -287,8 +313,6 @@ class AirportCacheService:
                     "type": "airport",
                     **airport
                 })
-            
-            seen_cities.add(city_key)
         
         return results
     
@@ -301,22 +325,12 @@ class AirportCacheService:
         try:
             cache = await get_redis()
             
-            index_data = await cache.get(AIRPORTS_INDEX_KEY)
-            if not index_data:
+            field = country_code.upper() if country_code else "all"
+            data = await cache.hget(AIRPORTS_POPULAR_KEY, field)
+            if not data:
                 return []
             
-            search_entries = json.loads(index_data)
-            
-            # Filter major airports
-            results = []
-            for entry in search_entries:
-                if entry["is_major"]:
-                    if country_code is None or entry["data"]["country_code"] == country_code.upper():
-                        results.append(entry["data"])
-            
-            # Sort by city name
-            results.sort(key=lambda x: x["city"])
-            return results[:limit]
+            return json.loads(data)[:limit]
             
         except Exception as e:
             logger.error(f"Error getting popular airports: {e}")
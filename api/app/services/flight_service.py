@@ -1,12 +1,16 @@
 """
 Flight Search Service - Aggregates results from multiple providers
 """
-from typing import List, Optional
+from typing import List, Optional, Set, Tuple
 from datetime import date
+import asyncio
 import logging
+import time
 
 from app.schemas.flight import FlightOffer
 from app.services.providers import ProviderManager, provider_manager
+from app.services.providers.base import normalize_iata_code
+from app.utils.memory_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +25,19 @@ class FlightService:
     - best_price: Search all, deduplicate by cheapest (best value)
     """
     
+    CALENDAR_CACHE_TTL = 3600  # Fresh for an hour
+    CALENDAR_CACHE_SWR = 600   # Then served stale while it's refreshed
+    CALENDAR_CACHE_NEGATIVE_TTL = 60  # Empty results, so failing providers aren't hammered
+    CALENDAR_CACHE_SIZE = 4096
+    
     def __init__(self, manager: Optional[ProviderManager] = None):
         self.manager = manager or provider_manager
+        # Entries are (fetched_at, prices), kept for TTL + SWR
+        self._calendar_cache = TTLCache(
+            self.CALENDAR_CACHE_SIZE, self.CALENDAR_CACHE_TTL + self.CALENDAR_CACHE_SWR
+        )
+        self._calendar_refreshing: Set[Tuple] = set()
+        self._background_tasks: Set[asyncio.Task] = set()
     
     async def search_flights(
         self,
@@ -65,13 +80,10 @@ class FlightService:
             return_date=return_date,
             passengers=passengers,
             cabin_class=cabin_class,
+            direct_only=direct_only,
             strategy=strategy,
         )
         
-        # Filter direct flights if requested
-        if direct_only:
-            offers = [o for o in offers if o.is_direct]
-        
         logger.info(f"Found {len(offers)} flight offers")
         return offers
     
@@ -134,7 +146,7 @@ class FlightService:
         if kiwi and kiwi.is_configured and kiwi.is_available:
             try:
                 return await kiwi.search_flexible_dates(
-                    origin, destination, date_from, date_to,
+                    normalize_iata_code(origin), normalize_iata_code(destination), date_from, date_to,
                     nights_from, nights_to, passengers
                 )
             except Exception as e:
@@ -152,7 +164,11 @@ class FlightService:
         """
         Get cheapest prices for each day of a month.
         
-        Useful for displaying price calendars.
+        Useful for displaying price calendars. Month calendars are stable
+        for hours, so results are memoized in-process per
+        (origin, destination, year, month): fresh for an hour, then served
+        stale for up to 10 more minutes while a background refresh runs.
+        Empty results are cached for a minute only.
         
         Args:
             origin: Origin airport code
@@ -163,7 +179,44 @@ class FlightService:
         Returns:
             List of dicts with "date", "price", "currency" keys
         """
-        return await self.manager.get_price_calendar(origin, destination, year, month)
+        cache_key = (origin, destination, year, month)
+        cached = self._calendar_cache.get(cache_key)
+        if cached is not None:
+            fetched_at, prices = cached
+            if (
+                time.monotonic() - fetched_at > self.CALENDAR_CACHE_TTL
+                and cache_key not in self._calendar_refreshing
+            ):
+                self._calendar_refreshing.add(cache_key)
+                task = asyncio.create_task(self._refresh_price_calendar(cache_key))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+            return list(prices)
+        
+        prices = await self._fetch_price_calendar(cache_key)
+        return list(prices)
+    
+    async def _fetch_price_calendar(self, cache_key: Tuple) -> List[dict]:
+        """Fetch a month's prices from the providers and cache them"""
+        prices = await self.manager.get_price_calendar(*cache_key)
+        if prices:
+            self._calendar_cache.set(cache_key, (time.monotonic(), prices))
+        else:
+            self._calendar_cache.set(
+                cache_key, (time.monotonic(), prices), ttl=self.CALENDAR_CACHE_NEGATIVE_TTL
+            )
+        return prices
+    
+    async def _refresh_price_calendar(self, cache_key: Tuple):
+        """Background refresh of a stale calendar entry (kept if the refresh comes back empty)"""
+        try:
+            prices = await self.manager.get_price_calendar(*cache_key)
+            if prices:
+                self._calendar_cache.set(cache_key, (time.monotonic(), prices))
+        except Exception as e:
+            logger.warning(f"Price calendar refresh failed for {cache_key}: {e}")
+        finally:
+            self._calendar_refreshing.discard(cache_key)
     
     async def get_provider_status(self) -> dict:
         """
@@ -1,12 +1,18 @@
 """
 Market Insights Service - Fetches and manages travel trends from Amadeus
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Iterable, ClassVar, Tuple
 from datetime import datetime, timedelta
+from functools import lru_cache
+import asyncio
+import base64
+import random
 import httpx
 import logging
+import orjson
+import zstandard
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, and_
+from sqlalchemy import select, update, delete, and_, or_, text, func, JSON
 from sqlalchemy.dialects.postgresql import insert
 
 from app.config import settings
@@ -18,9 +24,116 @@ from app.models.market_insights import (
     MarketInsightsSyncLog
 )
 from app.models.airport import Airport
+from app.utils.memory_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Destination info used when an airport is missing from the airports table
+_UNKNOWN_AIRPORT = {"city": None, "country": None, "country_code": None}
+
+
+# Cached insights payloads are zstd-compressed JSON. The shared Redis client
+# decodes responses as UTF-8, so the frame is base64-encoded and tagged with
+# a format prefix; untagged values are plain JSON written by older code.
+_CACHE_FORMAT_TAG = "z1:"
+_ZSTD_COMPRESSOR = zstandard.ZstdCompressor(level=3)
+_ZSTD_DECOMPRESSOR = zstandard.ZstdDecompressor()
+
+
+def _pack_cached(data: Any) -> str:
+    """Serialize an insights payload for Redis"""
+    frame = _ZSTD_COMPRESSOR.compress(orjson.dumps(data))
+    return _CACHE_FORMAT_TAG + base64.b64encode(frame).decode("ascii")
+
+
+def _unpack_cached(cached: str) -> Any:
+    """Deserialize a value written by _pack_cached (or legacy plain JSON)"""
+    if cached.startswith(_CACHE_FORMAT_TAG):
+        frame = base64.b64decode(cached[len(_CACHE_FORMAT_TAG):])
+        return orjson.loads(_ZSTD_DECOMPRESSOR.decompress(frame))
+    return orjson.loads(cached)
+
+
+# Cache lifetimes for insights payloads
+_INSIGHTS_CACHE_TTL = 86400  # 24h; traveled/booked/busiest only change on weekly syncs
+_TRENDING_CACHE_TTL = 3600   # 1h
+
+
+@lru_cache(maxsize=4096)
+def _cache_key(insight_type: str, origin: str, variant: Any) -> str:
+    """Build (and memoize) the insights:{type}:{origin}:{variant} cache key"""
+    return f"insights:{insight_type}:{origin}:{variant}"
+
+
+@lru_cache(maxsize=16)
+def _parse_period(period: str) -> Tuple[int, Optional[int], str]:
+    """Parse a YYYY or YYYY-MM period into (year, month, period_type)"""
+    year = int(period[:4])
+    month = int(period[5:7]) if len(period) > 4 else None
+    return year, month, "MONTHLY" if month else "YEARLY"
+
+
+def _build_upsert(model, constraint: str, update_columns: Tuple[str, ...]):
+    """
+    Build an INSERT ... ON CONFLICT DO UPDATE for model.
+    
+    Updated values come from excluded.*, so the statement does not depend
+    on row data: it is built once and executed with a list of row dicts,
+    letting SQLAlchemy reuse the compiled SQL and batch the rows.
+    
+    The update only fires when a compared column actually changed, so
+    re-syncing identical data rewrites no tuples and writes no WAL. JSON
+    columns (raw_data) have no equality operator in Postgres and are left
+    out of the comparison; they are derived from the compared fields anyway.
+    """
+    stmt = insert(model)
+    columns = model.__table__.c
+    set_ = {column: stmt.excluded[column] for column in update_columns}
+    set_["updated_at"] = func.now()
+    changed = or_(*[
+        columns[column].is_distinct_from(stmt.excluded[column])
+        for column in update_columns
+        if not isinstance(columns[column].type, JSON)
+    ])
+    return stmt.on_conflict_do_update(constraint=constraint, set_=set_, where=changed)
+
+
+_TRAVELED_UPSERT = _build_upsert(
+    TraveledDestination,
+    "uq_traveled_dest_period",
+    ("destination_city", "destination_country", "travelers_count",
+     "analytics_score", "rank", "raw_data"),
+)
+_BOOKED_UPSERT = _build_upsert(
+    BookedDestination,
+    "uq_booked_dest_period",
+    ("destination_city", "bookings_count", "analytics_score", "rank", "raw_data"),
+)
+_BUSIEST_UPSERT = _build_upsert(
+    BusiestTravelPeriod,
+    "uq_busiest_period",
+    ("travelers_count", "analytics_score", "rank", "raw_data"),
+)
+_TRENDING_UPSERT = _build_upsert(
+    TrendingDestination,
+    "uq_trending_dest",
+    ("destination_city", "trending_score", "travel_score", "booking_score",
+     "score_change", "rank", "valid_until"),
+)
+
+# Columns served by the trending endpoints
+_TRENDING_COLUMNS = (
+    TrendingDestination.destination_code,
+    TrendingDestination.destination_city,
+    TrendingDestination.destination_country,
+    TrendingDestination.trending_score,
+    TrendingDestination.travel_score,
+    TrendingDestination.booking_score,
+    TrendingDestination.score_change,
+    TrendingDestination.rank,
+    TrendingDestination.tags,
+)
+
 
 class MarketInsightsService:
     """
@@ -41,11 +154,30 @@ class MarketInsightsService:
         "SIN", "HKG", "NRT", "ICN", "BKK", "DXB", "DOH", "SYD", "MEL"
     ]
     
+    # Retries for rate-limited (429) or failing (5xx) Amadeus requests
+    AMADEUS_MAX_ATTEMPTS = 5
+    AMADEUS_MAX_BACKOFF = 30  # seconds
+    
+    # Keys per SCAN page / UNLINK call when invalidating cached insights
+    INVALIDATE_BATCH_SIZE = 500
+    
+    # Airport reference data barely changes; share lookups across instances
+    _airport_cache = TTLCache(maxsize=10000, ttl=86400)
+    
+    # OAuth token shared by every instance in the process, and via Redis
+    # across processes, so per-request instances don't each re-authenticate
+    TOKEN_CACHE_KEY = "amadeus:token"
+    _token: ClassVar[Optional[str]] = None
+    _token_expiry: ClassVar[Optional[datetime]] = None
+    _token_lock: ClassVar[Optional[asyncio.Lock]] = None
+    _token_lock_loop: ClassVar[Optional[asyncio.AbstractEventLoop]] = None
+    
     def __init__(self, db: AsyncSession, cache=None):
         self.db = db
         self.cache = cache
-        self._token: Optional[str] = None
-        self._token_expiry: Optional[datetime] = None
+        # Caps Amadeus requests in flight (including backoff waits) for rate limits
+        self._amadeus_sem = asyncio.Semaphore(settings.AMADEUS_MAX_CONCURRENCY)
+        self._client: Optional[httpx.AsyncClient] = None
     
     @property
     def is_configured(self) -> bool:
@@ -57,13 +189,53 @@ class MarketInsightsService:
         """Get Amadeus API base URL"""
         return settings.AMADEUS_BASE_URL.replace("/v2", "")
     
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the HTTP client shared by a sync run, creating it on first use"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=16),
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @classmethod
+    def _get_token_lock(cls) -> asyncio.Lock:
+        """Get the class-wide token lock for the running event loop"""
+        # A lock is tied to one loop; Celery tasks each run a fresh one
+        loop = asyncio.get_running_loop()
+        if cls._token_lock is None or cls._token_lock_loop is not loop:
+            cls._token_lock = asyncio.Lock()
+            cls._token_lock_loop = loop
+        return cls._token_lock
+    
     async def _get_token(self) -> str:
-        """Get or refresh OAuth token"""
-        if self._token and self._token_expiry and datetime.utcnow() < self._token_expiry:
-            return self._token
+        """Get OAuth token from the process, then Redis, refreshing if neither has one"""
+        cls = MarketInsightsService
+        if cls._token and cls._token_expiry and datetime.utcnow() < cls._token_expiry:
+            return cls._token
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+        # Concurrent fetches share one refresh instead of each requesting a token
+        async with cls._get_token_lock():
+            if cls._token and cls._token_expiry and datetime.utcnow() < cls._token_expiry:
+                return cls._token
+            
+            if self.cache:
+                cached_token = await self.cache.get(self.TOKEN_CACHE_KEY)
+                if cached_token:
+                    # Keep it in-process too, so later calls skip the lock and Redis
+                    ttl = await self.cache.ttl(self.TOKEN_CACHE_KEY)
+                    if ttl > 0:
+                        cls._token = cached_token
+                        cls._token_expiry = datetime.utcnow() + timedelta(seconds=ttl)
+                    return cached_token
+            
+            response = await self._get_client().post(
                 f"{self.base_url}/v1/security/oauth2/token",
                 data={
                     "grant_type": "client_credentials",
@@ -75,26 +247,173 @@ class MarketInsightsService:
             response.raise_for_status()
             data = response.json()
             
-            self._token = data["access_token"]
-            self._token_expiry = datetime.utcnow() + timedelta(seconds=data["expires_in"] - 60)
+            ttl = data["expires_in"] - 60
+            cls._token = data["access_token"]
+            cls._token_expiry = datetime.utcnow() + timedelta(seconds=ttl)
             
-            return self._token
+            if self.cache:
+                await self.cache.setex(self.TOKEN_CACHE_KEY, ttl, cls._token)
+            
+            return cls._token
+    
+    async def _amadeus_get(self, path: str, params: dict, description: str) -> List[Dict]:
+        """
+        GET an Amadeus analytics endpoint and return its "data" list.
+        
+        At most AMADEUS_MAX_CONCURRENCY requests run at once. Rate-limited
+        (429) and server error (5xx) responses are retried with exponential
+        backoff, honouring Retry-After when given.
+        
+        Returns an empty list if the API is not configured or the request
+        fails; description is used in log messages.
+        """
+        if not self.is_configured:
+            logger.warning("Amadeus API not configured")
+            return []
+        
+        try:
+            async with self._amadeus_sem:
+                for attempt in range(self.AMADEUS_MAX_ATTEMPTS):
+                    token = await self._get_token()
+                    
+                    response = await self._get_client().get(
+                        f"{self.base_url}{path}",
+                        params=params,
+                        headers={"Authorization": f"Bearer {token}"},
+                    )
+                    
+                    retryable = response.status_code == 429 or response.status_code >= 500
+                    if not retryable or attempt == self.AMADEUS_MAX_ATTEMPTS - 1:
+                        break
+                    
+                    delay = self._retry_delay(response, attempt)
+                    logger.info(
+                        f"Amadeus {description} returned {response.status_code}, "
+                        f"retrying in {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+            
+            if response.status_code == 200:
+                return response.json().get("data", [])
+            
+            logger.warning(f"Amadeus {description} returned {response.status_code}: {response.text}")
+            return []
+            
+        except Exception as e:
+            logger.error(f"Error fetching {description}: {e}")
+            return []
+    
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        """Seconds to wait before retrying: Retry-After, else jittered 2^attempt"""
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(self.AMADEUS_MAX_BACKOFF, int(retry_after))
+        return min(self.AMADEUS_MAX_BACKOFF, 2 ** attempt) + random.random()
     
     async def _get_airport_info(self, code: str) -> Dict[str, str]:
-        """Get airport city/country info from database"""
+        """Get airport city/country info from the process cache or database"""
+        cached = self._airport_cache.get(code)
+        if cached is not None:
+            return cached
+        
         result = await self.db.execute(
             select(Airport).where(Airport.iata_code == code)
         )
         airport = result.scalar_one_or_none()
         
         if airport:
-            return {
+            info = {
                 "city": airport.city,
                 "country": airport.country,
                 "country_code": airport.country_code
             }
+            self._airport_cache.set(code, info)
+            return info
         return {"city": None, "country": None, "country_code": None}
     
+    async def _get_airport_info_bulk(self, codes: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Get city/country info for many airports.
+        
+        Codes already in the process cache are served from it; the rest are
+        loaded with a single query and cached.
+        """
+        info_map: Dict[str, Dict[str, str]] = {}
+        missing = []
+        for code in set(codes):
+            cached = self._airport_cache.get(code)
+            if cached is not None:
+                info_map[code] = cached
+            else:
+                missing.append(code)
+        
+        if not missing:
+            return info_map
+        
+        result = await self.db.execute(
+            select(Airport.iata_code, Airport.city, Airport.country, Airport.country_code)
+            .where(Airport.iata_code.in_(missing))
+        )
+        for row in result.all():
+            info = {
+                "city": row.city,
+                "country": row.country,
+                "country_code": row.country_code,
+            }
+            self._airport_cache.set(row.iata_code, info)
+            info_map[row.iata_code] = info
+        
+        return info_map
+    
+    async def _fetch_concurrently(
+        self,
+        fetch: Callable[..., Awaitable[List[Dict]]],
+        calls: List[tuple],
+    ) -> List[Any]:
+        """
+        Run fetch(*args) for every args tuple in calls concurrently.
+        
+        _amadeus_get bounds how many requests are actually in flight.
+        Results come back in the order of calls; a failed call yields its
+        exception instead of a list. The shared HTTP client is closed
+        afterwards.
+        """
+        try:
+            return await asyncio.gather(
+                *[fetch(*args) for args in calls],
+                return_exceptions=True
+            )
+        finally:
+            await self.close()
+    
+    async def _start_sync_log(self, sync_type: str, **values) -> Tuple[Any, datetime]:
+        """
+        Insert a STARTED sync log row and return its id and start time.
+        
+        The row is not committed here; it becomes visible together with the
+        sync's data in the run's single commit.
+        """
+        started_at = datetime.utcnow()
+        result = await self.db.execute(
+            insert(MarketInsightsSyncLog)
+            .values(sync_type=sync_type, status="STARTED", started_at=started_at, **values)
+            .returning(MarketInsightsSyncLog.id)
+        )
+        return result.scalar_one(), started_at
+    
+    async def _finish_sync_log(self, sync_log_id: Any, started_at: datetime, **values):
+        """Record the outcome of a sync on its log row"""
+        completed_at = datetime.utcnow()
+        await self.db.execute(
+            update(MarketInsightsSyncLog)
+            .where(MarketInsightsSyncLog.id == sync_log_id)
+            .values(
+                completed_at=completed_at,
+                duration_seconds=(completed_at - started_at).total_seconds(),
+                **values
+            )
+        )
+    
     # =========================================================================
     # MOST TRAVELED DESTINATIONS
     # =========================================================================
@@ -110,35 +429,16 @@ class MarketInsightsService:
         
         Amadeus API: GET /v1/travel/analytics/air-traffic/traveled
         """
-        if not self.is_configured:
-            logger.warning("Amadeus API not configured")
-            return []
-        
-        try:
-            token = await self._get_token()
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/travel/analytics/air-traffic/traveled",
-                    params={
-                        "originCityCode": origin,
-                        "period": period,
-                        "max": max_results,
-                        "sort": "analytics.travelers.score",
-                    },
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=30.0,
-                )
-                
-                if response.status_code == 200:
-                    return response.json().get("data", [])
-                else:
-                    logger.warning(f"Amadeus most traveled API returned {response.status_code}: {response.text}")
-                    return []
-                    
-        except Exception as e:
-            logger.error(f"Error fetching most traveled for {origin}: {e}")
-            return []
+        return await self._amadeus_get(
+            "/v1/travel/analytics/air-traffic/traveled",
+            {
+                "originCityCode": origin,
+                "period": period,
+                "max": max_results,
+                "sort": "analytics.travelers.score",
+            },
+            f"most traveled for {origin}",
+        )
     
     async def sync_most_traveled(
         self,
@@ -151,70 +451,63 @@ class MarketInsightsService:
         origins = origins or self.MAJOR_ORIGINS
         period = period or str(datetime.now().year - 1)  # Previous year
         
-        # Parse period
-        period_year = int(period[:4])
-        period_month = int(period[5:7]) if len(period) > 4 else None
-        period_type = "MONTHLY" if period_month else "YEARLY"
+        period_year, period_month, period_type = _parse_period(period)
         
         # Create sync log
-        sync_log = MarketInsightsSyncLog(
-            sync_type="TRAVELED",
-            status="STARTED",
-            started_at=datetime.utcnow(),
-            metadata={"origins": origins, "period": period}
+        sync_log_id, started_at = await self._start_sync_log(
+            "TRAVELED", extra_data={"origins": origins, "period": period}
         )
-        self.db.add(sync_log)
-        await self.db.commit()
+        status, error_message = "STARTED", None
         
         stats = {"fetched": 0, "created": 0, "updated": 0, "failed": 0}
         
         try:
-            for origin in origins:
+            results = await self._fetch_concurrently(
+                self.fetch_most_traveled, [(origin, period) for origin in origins]
+            )
+            
+            for origin, data in zip(origins, results):
                 try:
-                    data = await self.fetch_most_traveled(origin, period)
+                    if isinstance(data, Exception):
+                        raise data
                     stats["fetched"] += len(data)
                     
-                    for rank, item in enumerate(data, 1):
-                        dest_code = item.get("destination")
-                        if not dest_code:
-                            continue
-                        
-                        # Get destination info
-                        dest_info = await self._get_airport_info(dest_code)
-                        
-                        # Upsert record
-                        travelers = item.get("analytics", {}).get("travelers", {})
+                    # Savepoint per origin: a failure rolls back only this origin
+                    async with self.db.begin_nested():
+                        airport_info = await self._get_airport_info_bulk(
+                            item["destination"] for item in data if item.get("destination")
+                        )
                         
-                        stmt = insert(TraveledDestination).values(
-                            origin_code=origin,
-                            destination_code=dest_code,
-                            destination_city=dest_info["city"],
-                            destination_country=dest_info["country"],
-                            destination_country_code=dest_info["country_code"],
-                            travelers_count=travelers.get("count"),
-                            analytics_score=travelers.get("score"),
-                            rank=rank,
-                            period_type=period_type,
-                            period_year=period_year,
-                            period_month=period_month,
-                            raw_data=item,
-                            fetched_at=datetime.utcnow(),
-                        ).on_conflict_do_update(
-                            constraint="uq_traveled_dest_period",
-                            set_={
+                        # One row per destination (a repeat would hit ON CONFLICT twice)
+                        rows: Dict[str, Dict] = {}
+                        for rank, item in enumerate(data, 1):
+                            dest_code = item.get("destination")
+                            if not dest_code or dest_code in rows:
+                                continue
+                            
+                            dest_info = airport_info.get(dest_code, _UNKNOWN_AIRPORT)
+                            travelers = item.get("analytics", {}).get("travelers", {})
+                            
+                            rows[dest_code] = {
+                                "origin_code": origin,
+                                "destination_code": dest_code,
                                 "destination_city": dest_info["city"],
                                 "destination_country": dest_info["country"],
+                                "destination_country_code": dest_info["country_code"],
                                 "travelers_count": travelers.get("count"),
                                 "analytics_score": travelers.get("score"),
                                 "rank": rank,
+                                "period_type": period_type,
+                                "period_year": period_year,
+                                "period_month": period_month,
                                 "raw_data": item,
-                                "updated_at": datetime.utcnow(),
                             }
-                        )
-                        await self.db.execute(stmt)
-                        stats["created"] += 1
+                        
+                        # Upsert all destinations for this origin in one execute
+                        if rows:
+                            await self.db.execute(_TRAVELED_UPSERT, list(rows.values()))
+                            stats["created"] += len(rows)
                     
-                    await self.db.commit()
                     logger.info(f"Synced {len(data)} traveled destinations from {origin}")
                     
                 except Exception as e:
@@ -222,24 +515,26 @@ class MarketInsightsService:
                     stats["failed"] += 1
                     continue
             
-            sync_log.status = "SUCCESS" if stats["failed"] == 0 else "PARTIAL"
+            status = "SUCCESS" if stats["failed"] == 0 else "PARTIAL"
             
         except Exception as e:
             logger.error(f"Error in sync_most_traveled: {e}")
-            sync_log.status = "FAILED"
-            sync_log.error_message = str(e)
-        
-        sync_log.records_fetched = stats["fetched"]
-        sync_log.records_created = stats["created"]
-        sync_log.records_failed = stats["failed"]
-        sync_log.completed_at = datetime.utcnow()
-        sync_log.duration_seconds = (sync_log.completed_at - sync_log.started_at).total_seconds()
+            status = "FAILED"
+            error_message = str(e)
         
+        await self._finish_sync_log(
+            sync_log_id, started_at,
+            status=status,
+            error_message=error_message,
+            records_fetched=stats["fetched"],
+            records_created=stats["created"],
+            records_failed=stats["failed"],
+        )
         await self.db.commit()
         
         # Invalidate cache
         if self.cache:
-            await self._invalidate_insights_cache("traveled")
+            await self._invalidate_insights_cache("traveled", origins)
         
         return stats
     
@@ -258,34 +553,16 @@ class MarketInsightsService:
         
         Amadeus API: GET /v1/travel/analytics/air-traffic/booked
         """
-        if not self.is_configured:
-            return []
-        
-        try:
-            token = await self._get_token()
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/travel/analytics/air-traffic/booked",
-                    params={
-                        "originCityCode": origin,
-                        "period": period,
-                        "max": max_results,
-                        "sort": "analytics.travelers.score",
-                    },
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=30.0,
-                )
-                
-                if response.status_code == 200:
-                    return response.json().get("data", [])
-                else:
-                    logger.warning(f"Amadeus most booked API returned {response.status_code}")
-                    return []
-                    
-        except Exception as e:
-            logger.error(f"Error fetching most booked for {origin}: {e}")
-            return []
+        return await self._amadeus_get(
+            "/v1/travel/analytics/air-traffic/booked",
+            {
+                "originCityCode": origin,
+                "period": period,
+                "max": max_results,
+                "sort": "analytics.travelers.score",
+            },
+            f"most booked for {origin}",
+        )
     
     async def sync_most_booked(
         self,
@@ -296,85 +573,83 @@ class MarketInsightsService:
         origins = origins or self.MAJOR_ORIGINS
         period = period or str(datetime.now().year - 1)
         
-        period_year = int(period[:4])
-        period_month = int(period[5:7]) if len(period) > 4 else None
-        period_type = "MONTHLY" if period_month else "YEARLY"
+        period_year, period_month, period_type = _parse_period(period)
         
-        sync_log = MarketInsightsSyncLog(
-            sync_type="BOOKED",
-            status="STARTED",
-            started_at=datetime.utcnow(),
-            metadata={"origins": origins, "period": period}
+        sync_log_id, started_at = await self._start_sync_log(
+            "BOOKED", extra_data={"origins": origins, "period": period}
         )
-        self.db.add(sync_log)
-        await self.db.commit()
+        status, error_message = "STARTED", None
         
         stats = {"fetched": 0, "created": 0, "updated": 0, "failed": 0}
         
         try:
-            for origin in origins:
+            results = await self._fetch_concurrently(
+                self.fetch_most_booked, [(origin, period) for origin in origins]
+            )
+            
+            for origin, data in zip(origins, results):
                 try:
-                    data = await self.fetch_most_booked(origin, period)
+                    if isinstance(data, Exception):
+                        raise data
                     stats["fetched"] += len(data)
                     
-                    for rank, item in enumerate(data, 1):
-                        dest_code = item.get("destination")
-                        if not dest_code:
-                            continue
-                        
-                        dest_info = await self._get_airport_info(dest_code)
-                        analytics = item.get("analytics", {}).get("travelers", {})
+                    # Savepoint per origin: a failure rolls back only this origin
+                    async with self.db.begin_nested():
+                        airport_info = await self._get_airport_info_bulk(
+                            item["destination"] for item in data if item.get("destination")
+                        )
                         
-                        stmt = insert(BookedDestination).values(
-                            origin_code=origin,
-                            destination_code=dest_code,
-                            destination_city=dest_info["city"],
-                            destination_country=dest_info["country"],
-                            destination_country_code=dest_info["country_code"],
-                            bookings_count=analytics.get("count"),
-                            analytics_score=analytics.get("score"),
-                            rank=rank,
-                            period_type=period_type,
-                            period_year=period_year,
-                            period_month=period_month,
-                            raw_data=item,
-                            fetched_at=datetime.utcnow(),
-                        ).on_conflict_do_update(
-                            constraint="uq_booked_dest_period",
-                            set_={
+                        rows: Dict[str, Dict] = {}
+                        for rank, item in enumerate(data, 1):
+                            dest_code = item.get("destination")
+                            if not dest_code or dest_code in rows:
+                                continue
+                            
+                            dest_info = airport_info.get(dest_code, _UNKNOWN_AIRPORT)
+                            analytics = item.get("analytics", {}).get("travelers", {})
+                            
+                            rows[dest_code] = {
+                                "origin_code": origin,
+                                "destination_code": dest_code,
                                 "destination_city": dest_info["city"],
+                                "destination_country": dest_info["country"],
+                                "destination_country_code": dest_info["country_code"],
                                 "bookings_count": analytics.get("count"),
                                 "analytics_score": analytics.get("score"),
                                 "rank": rank,
+                                "period_type": period_type,
+                                "period_year": period_year,
+                                "period_month": period_month,
                                 "raw_data": item,
-                                "updated_at": datetime.utcnow(),
                             }
-                        )
-                        await self.db.execute(stmt)
-                        stats["created"] += 1
+                        
+                        if rows:
+                            await self.db.execute(_BOOKED_UPSERT, list(rows.values()))
+                            stats["created"] += len(rows)
                     
-                    await self.db.commit()
                     logger.info(f"Synced {len(data)} booked destinations from {origin}")
                     
                 except Exception as e:
                     logger.error(f"Error syncing booked for {origin}: {e}")
                     stats["failed"] += 1
             
-            sync_log.status = "SUCCESS" if stats["failed"] == 0 else "PARTIAL"
+            status = "SUCCESS" if stats["failed"] == 0 else "PARTIAL"
             
         except Exception as e:
-            sync_log.status = "FAILED"
-            sync_log.error_message = str(e)
-        
-        sync_log.records_fetched = stats["fetched"]
-        sync_log.records_created = stats["created"]
-        sync_log.completed_at = datetime.utcnow()
-        sync_log.duration_seconds = (sync_log.completed_at - sync_log.started_at).total_seconds()
+            status = "FAILED"
+            error_message = str(e)
         
+        await self._finish_sync_log(
+            sync_log_id, started_at,
+            status=status,
+            error_message=error_message,
+            records_fetched=stats["fetched"],
+            records_created=stats["created"],
+        )
         await self.db.commit()
         
         if self.cache:
-            await self._invalidate_insights_cache("booked")
+            await self._invalidate_insights_cache("booked", origins)
         
         return stats
     
@@ -393,33 +668,15 @@ class MarketInsightsService:
         
         Amadeus API: GET /v1/travel/analytics/air-traffic/busiest-period
         """
-        if not self.is_configured:
-            return []
-        
-        try:
-            token = await self._get_token()
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/travel/analytics/air-traffic/busiest-period",
-                    params={
-                        "cityCode": origin,
-                        "period": period,
-                        "direction": direction,
-                    },
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=30.0,
-                )
-                
-                if response.status_code == 200:
-                    return response.json().get("data", [])
-                else:
-                    logger.warning(f"Amadeus busiest period API returned {response.status_code}")
-                    return []
-                    
-        except Exception as e:
-            logger.error(f"Error fetching busiest period for {origin}: {e}")
-            return []
+        return await self._amadeus_get(
+            "/v1/travel/analytics/air-traffic/busiest-period",
+            {
+                "cityCode": origin,
+                "period": period,
+                "direction": direction,
+            },
+            f"busiest period for {origin}",
+        )
     
     async def sync_busiest_periods(
         self,
@@ -429,79 +686,79 @@ class MarketInsightsService:
         """Sync busiest traveling periods."""
         origins = origins or self.MAJOR_ORIGINS
         period = period or str(datetime.now().year - 1)
-        period_year = int(period[:4])
+        period_year, _, _ = _parse_period(period)
         
-        sync_log = MarketInsightsSyncLog(
-            sync_type="BUSIEST",
-            status="STARTED",
-            started_at=datetime.utcnow(),
-            metadata={"origins": origins, "period": period}
+        sync_log_id, started_at = await self._start_sync_log(
+            "BUSIEST", extra_data={"origins": origins, "period": period}
         )
-        self.db.add(sync_log)
-        await self.db.commit()
+        status, error_message = "STARTED", None
         
         stats = {"fetched": 0, "created": 0, "failed": 0}
         
         try:
-            for origin in origins:
-                for direction in ["DEPARTING", "ARRIVING"]:
-                    try:
-                        data = await self.fetch_busiest_period(origin, direction, period)
-                        stats["fetched"] += len(data)
-                        
+            calls = [
+                (origin, direction, period)
+                for origin in origins
+                for direction in ["DEPARTING", "ARRIVING"]
+            ]
+            results = await self._fetch_concurrently(self.fetch_busiest_period, calls)
+            
+            for (origin, direction, _), data in zip(calls, results):
+                try:
+                    if isinstance(data, Exception):
+                        raise data
+                    stats["fetched"] += len(data)
+                    
+                    # Savepoint per origin: a failure rolls back only this origin
+                    async with self.db.begin_nested():
+                        rows: Dict[int, Dict] = {}
                         for rank, item in enumerate(data, 1):
                             period_str = item.get("period", "")
                             if len(period_str) >= 7:
                                 month = int(period_str[5:7])
                             else:
                                 continue
+                            if month in rows:
+                                continue
                             
                             analytics = item.get("analytics", {}).get("travelers", {})
                             
-                            stmt = insert(BusiestTravelPeriod).values(
-                                origin_code=origin,
-                                period_year=period_year,
-                                period_month=month,
-                                direction=direction,
-                                travelers_count=analytics.get("count"),
-                                analytics_score=analytics.get("score"),
-                                rank=rank,
-                                raw_data=item,
-                                fetched_at=datetime.utcnow(),
-                            ).on_conflict_do_update(
-                                constraint="uq_busiest_period",
-                                set_={
-                                    "travelers_count": analytics.get("count"),
-                                    "analytics_score": analytics.get("score"),
-                                    "rank": rank,
-                                    "raw_data": item,
-                                    "updated_at": datetime.utcnow(),
-                                }
-                            )
-                            await self.db.execute(stmt)
-                            stats["created"] += 1
-                        
-                        await self.db.commit()
+                            rows[month] = {
+                                "origin_code": origin,
+                                "period_year": period_year,
+                                "period_month": month,
+                                "direction": direction,
+                                "travelers_count": analytics.get("count"),
+                                "analytics_score": analytics.get("score"),
+                                "rank": rank,
+                                "raw_data": item,
+                            }
                         
-                    except Exception as e:
-                        logger.error(f"Error syncing busiest for {origin}/{direction}: {e}")
-                        stats["failed"] += 1
+                        if rows:
+                            await self.db.execute(_BUSIEST_UPSERT, list(rows.values()))
+                            stats["created"] += len(rows)
+                    
+                except Exception as e:
+                    logger.error(f"Error syncing busiest for {origin}/{direction}: {e}")
+                    stats["failed"] += 1
             
-            sync_log.status = "SUCCESS" if stats["failed"] == 0 else "PARTIAL"
+            status = "SUCCESS" if stats["failed"] == 0 else "PARTIAL"
             
         except Exception as e:
-            sync_log.status = "FAILED"
-            sync_log.error_message = str(e)
-        
-        sync_log.records_fetched = stats["fetched"]
-        sync_log.records_created = stats["created"]
-        sync_log.completed_at = datetime.utcnow()
-        sync_log.duration_seconds = (sync_log.completed_at - sync_log.started_at).total_seconds()
+            status = "FAILED"
+            error_message = str(e)
         
+        await self._finish_sync_log(
+            sync_log_id, started_at,
+            status=status,
+            error_message=error_message,
+            records_fetched=stats["fetched"],
+            records_created=stats["created"],
+        )
         await self.db.commit()
         
         if self.cache:
-            await self._invalidate_insights_cache("busiest")
+            await self._invalidate_insights_cache("busiest", origins)
         
         return stats
     
@@ -517,151 +774,109 @@ class MarketInsightsService:
         """
         Calculate trending destinations by combining traveled and booked data.
         """
-        sync_log = MarketInsightsSyncLog(
-            sync_type="TRENDING",
-            origin_code=origin,
-            status="STARTED",
-            started_at=datetime.utcnow(),
-        )
-        self.db.add(sync_log)
-        await self.db.commit()
+        sync_log_id, started_at = await self._start_sync_log("TRENDING", origin_code=origin)
+        status, error_message = "STARTED", None
         
         stats = {"created": 0, "updated": 0}
         
         try:
-            # Aggregate scores from traveled and booked destinations
-            if origin == "GLOBAL":
-                # Aggregate across all origins
-                traveled_query = """
-                    SELECT destination_code, 
-                           AVG(analytics_score) as travel_score,
-                           MAX(destination_city) as city,
-                           MAX(destination_country) as country,
-                           MAX(destination_country_code) as country_code
-                    FROM traveled_destinations 
-                    WHERE is_active = TRUE
-                    GROUP BY destination_code
-                    ORDER BY travel_score DESC
+            # Savepoint so a failed calculation still leaves the log row to commit
+            async with self.db.begin_nested():
+                # Join per-destination travel and booking scores and rank by the
+                # composite score (60% travel, 40% booking) in a single query
+                origin_filter = "" if origin == "GLOBAL" else "AND origin_code = :origin"
+                trending_query = f"""
+                    WITH t AS (
+                        SELECT destination_code,
+                               AVG(analytics_score) as travel_score,
+                               MAX(destination_city) as city,
+                               MAX(destination_country) as country,
+                               MAX(destination_country_code) as country_code
+                        FROM traveled_destinations
+                        WHERE is_active = TRUE {origin_filter}
+                        GROUP BY destination_code
+                    ), b AS (
+                        SELECT destination_code, AVG(analytics_score) as book_score
+                        FROM booked_destinations
+                        WHERE is_active = TRUE {origin_filter}
+                        GROUP BY destination_code
+                    )
+                    SELECT t.destination_code, t.city, t.country, t.country_code,
+                           COALESCE(t.travel_score, 0) as travel_score,
+                           COALESCE(b.book_score, 0) as book_score,
+                           COALESCE(t.travel_score, 0) * 0.6
+                               + COALESCE(b.book_score, 0) * 0.4 as composite
+                    FROM t LEFT JOIN b USING (destination_code)
+                    ORDER BY composite DESC
                     LIMIT :limit
                 """
-                booked_query = """
-                    SELECT destination_code, AVG(analytics_score) as book_score
-                    FROM booked_destinations
-                    WHERE is_active = TRUE
-                    GROUP BY destination_code
-                """
-            else:
-                traveled_query = """
-                    SELECT destination_code, analytics_score as travel_score,
-                           destination_city as city, destination_country as country,
-                           destination_country_code as country_code
-                    FROM traveled_destinations
-                    WHERE origin_code = :origin AND is_active = TRUE
-                    ORDER BY analytics_score DESC
-                    LIMIT :limit
-                """
-                booked_query = """
-                    SELECT destination_code, analytics_score as book_score
-                    FROM booked_destinations
-                    WHERE origin_code = :origin AND is_active = TRUE
-                """
-            
-            from sqlalchemy import text
-            
-            traveled_result = await self.db.execute(
-                text(traveled_query), {"origin": origin, "limit": top_n * 2}
-            )
-            traveled_rows = traveled_result.fetchall()
-            
-            booked_result = await self.db.execute(
-                text(booked_query), {"origin": origin}
-            )
-            booked_scores = {row[0]: row[1] for row in booked_result.fetchall()}
-            
-            # Calculate composite scores
-            destinations = []
-            for row in traveled_rows:
-                dest_code = row[0]
-                travel_score = row[1] or 0
-                book_score = booked_scores.get(dest_code, 0) or 0
                 
-                # Composite: 60% travel, 40% booking
-                composite_score = (travel_score * 0.6) + (book_score * 0.4)
+                trending_result = await self.db.execute(
+                    text(trending_query), {"origin": origin, "limit": top_n}
+                )
+                destinations = [
+                    {
+                        "code": row.destination_code,
+                        "city": row.city,
+                        "country": row.country,
+                        "country_code": row.country_code,
+                        "travel_score": row.travel_score,
+                        "book_score": row.book_score,
+                        "composite": row.composite,
+                    }
+                    for row in trending_result.all()
+                ]
                 
-                destinations.append({
-                    "code": dest_code,
-                    "city": row[2],
-                    "country": row[3],
-                    "country_code": row[4],
-                    "travel_score": travel_score,
-                    "book_score": book_score,
-                    "composite": composite_score,
-                })
-            
-            # Sort by composite score and take top N
-            destinations.sort(key=lambda x: x["composite"], reverse=True)
-            destinations = destinations[:top_n]
-            
-            # Get previous scores for change calculation
-            prev_scores = {}
-            prev_result = await self.db.execute(
-                select(TrendingDestination.destination_code, TrendingDestination.trending_score)
-                .where(TrendingDestination.origin_code == origin)
-            )
-            for row in prev_result.fetchall():
-                prev_scores[row[0]] = row[1]
-            
-            # Upsert trending destinations
-            valid_until = datetime.utcnow() + timedelta(days=7)
-            
-            for rank, dest in enumerate(destinations, 1):
-                prev_score = prev_scores.get(dest["code"], dest["composite"])
-                score_change = dest["composite"] - prev_score if prev_score else 0
+                # Get previous scores for change calculation
+                prev_result = await self.db.execute(
+                    select(TrendingDestination.destination_code, TrendingDestination.trending_score)
+                    .where(TrendingDestination.origin_code == origin)
+                )
+                prev_scores = dict(prev_result.tuples().all())
+                
+                # Upsert trending destinations
+                valid_until = datetime.utcnow() + timedelta(days=7)
                 
-                stmt = insert(TrendingDestination).values(
-                    origin_code=origin,
-                    destination_code=dest["code"],
-                    destination_city=dest["city"],
-                    destination_country=dest["country"],
-                    destination_country_code=dest["country_code"],
-                    trending_score=dest["composite"],
-                    travel_score=dest["travel_score"],
-                    booking_score=dest["book_score"],
-                    score_change=score_change,
-                    rank=rank,
-                    valid_until=valid_until,
-                    fetched_at=datetime.utcnow(),
-                ).on_conflict_do_update(
-                    constraint="uq_trending_dest",
-                    set_={
+                rows = []
+                for rank, dest in enumerate(destinations, 1):
+                    prev_score = prev_scores.get(dest["code"], dest["composite"])
+                    score_change = dest["composite"] - prev_score if prev_score else 0
+                    
+                    rows.append({
+                        "origin_code": origin,
+                        "destination_code": dest["code"],
                         "destination_city": dest["city"],
+                        "destination_country": dest["country"],
+                        "destination_country_code": dest["country_code"],
                         "trending_score": dest["composite"],
                         "travel_score": dest["travel_score"],
                         "booking_score": dest["book_score"],
                         "score_change": score_change,
                         "rank": rank,
                         "valid_until": valid_until,
-                        "updated_at": datetime.utcnow(),
-                    }
-                )
-                await self.db.execute(stmt)
-                stats["created"] += 1
+                    })
+                
+                if rows:
+                    await self.db.execute(_TRENDING_UPSERT, rows)
+                    stats["created"] += len(rows)
             
-            await self.db.commit()
-            sync_log.status = "SUCCESS"
+            status = "SUCCESS"
             
         except Exception as e:
             logger.error(f"Error calculating trending: {e}")
-            sync_log.status = "FAILED"
-            sync_log.error_message = str(e)
+            status = "FAILED"
+            error_message = str(e)
         
-        sync_log.records_created = stats["created"]
-        sync_log.completed_at = datetime.utcnow()
-        sync_log.duration_seconds = (sync_log.completed_at - sync_log.started_at).total_seconds()
+        await self._finish_sync_log(
+            sync_log_id, started_at,
+            status=status,
+            error_message=error_message,
+            records_created=stats["created"],
+        )
         await self.db.commit()
         
         if self.cache:
-            await self._invalidate_insights_cache("trending")
+            await self._invalidate_insights_cache("trending", [origin])
         
         return stats
     
@@ -673,39 +888,33 @@ class MarketInsightsService:
         self,
         origin: str,
         limit: int = 20,
-    ) -> List[TraveledDestination]:
+    ) -> List[Dict]:
         """Get most traveled destinations from cache or database."""
-        cache_key = f"insights:traveled:{origin}:{limit}"
+        cache_key = _cache_key("traveled", origin, limit)
         
         if self.cache:
             cached = await self.cache.get(cache_key)
             if cached:
-                import json
-                return json.loads(cached)
+                return _unpack_cached(cached)
         
+        # Select just the serialized columns; no ORM entities are built
         result = await self.db.execute(
-            select(TraveledDestination)
+            select(
+                TraveledDestination.destination_code,
+                TraveledDestination.destination_city,
+                TraveledDestination.destination_country,
+                TraveledDestination.travelers_count,
+                TraveledDestination.analytics_score,
+                TraveledDestination.rank,
+            )
             .where(TraveledDestination.origin_code == origin, TraveledDestination.is_active == True)
             .order_by(TraveledDestination.rank)
             .limit(limit)
         )
-        destinations = result.scalars().all()
-        
-        data = [
-            {
-                "destination_code": d.destination_code,
-                "destination_city": d.destination_city,
-                "destination_country": d.destination_country,
-                "travelers_count": d.travelers_count,
-                "analytics_score": d.analytics_score,
-                "rank": d.rank,
-            }
-            for d in destinations
-        ]
+        data = [dict(row) for row in result.mappings().all()]
         
         if self.cache and data:
-            import json
-            await self.cache.setex(cache_key, 86400, json.dumps(data))  # 24h cache
+            await self.cache.setex(cache_key, _INSIGHTS_CACHE_TTL, _pack_cached(data))
         
         return data
     
@@ -715,37 +924,31 @@ class MarketInsightsService:
         limit: int = 20,
     ) -> List[Dict]:
         """Get most booked destinations."""
-        cache_key = f"insights:booked:{origin}:{limit}"
+        cache_key = _cache_key("booked", origin, limit)
         
         if self.cache:
             cached = await self.cache.get(cache_key)
             if cached:
-                import json
-                return json.loads(cached)
+                return _unpack_cached(cached)
         
+        # Select just the serialized columns; no ORM entities are built
         result = await self.db.execute(
-            select(BookedDestination)
+            select(
+                BookedDestination.destination_code,
+                BookedDestination.destination_city,
+                BookedDestination.destination_country,
+                BookedDestination.bookings_count,
+                BookedDestination.analytics_score,
+                BookedDestination.rank,
+            )
             .where(BookedDestination.origin_code == origin, BookedDestination.is_active == True)
             .order_by(BookedDestination.rank)
             .limit(limit)
         )
-        destinations = result.scalars().all()
-        
-        data = [
-            {
-                "destination_code": d.destination_code,
-                "destination_city": d.destination_city,
-                "destination_country": d.destination_country,
-                "bookings_count": d.bookings_count,
-                "analytics_score": d.analytics_score,
-                "rank": d.rank,
-            }
-            for d in destinations
-        ]
+        data = [dict(row) for row in result.mappings().all()]
         
         if self.cache and data:
-            import json
-            await self.cache.setex(cache_key, 86400, json.dumps(data))
+            await self.cache.setex(cache_key, _INSIGHTS_CACHE_TTL, _pack_cached(data))
         
         return data
     
@@ -755,16 +958,22 @@ class MarketInsightsService:
         direction: str = "DEPARTING",
     ) -> List[Dict]:
         """Get busiest traveling periods."""
-        cache_key = f"insights:busiest:{origin}:{direction}"
+        cache_key = _cache_key("busiest", origin, direction)
         
         if self.cache:
             cached = await self.cache.get(cache_key)
             if cached:
-                import json
-                return json.loads(cached)
+                return _unpack_cached(cached)
         
+        # Select just the serialized columns; no ORM entities are built
         result = await self.db.execute(
-            select(BusiestTravelPeriod)
+            select(
+                BusiestTravelPeriod.period_month.label("month"),
+                BusiestTravelPeriod.period_year.label("year"),
+                BusiestTravelPeriod.travelers_count,
+                BusiestTravelPeriod.analytics_score,
+                BusiestTravelPeriod.rank,
+            )
             .where(
                 BusiestTravelPeriod.origin_code == origin,
                 BusiestTravelPeriod.direction == direction,
@@ -772,22 +981,10 @@ class MarketInsightsService:
             )
             .order_by(BusiestTravelPeriod.rank)
         )
-        periods = result.scalars().all()
-        
-        data = [
-            {
-                "month": p.period_month,
-                "year": p.period_year,
-                "travelers_count": p.travelers_count,
-                "analytics_score": p.analytics_score,
-                "rank": p.rank,
-            }
-            for p in periods
-        ]
+        data = [dict(row) for row in result.mappings().all()]
         
         if self.cache and data:
-            import json
-            await self.cache.setex(cache_key, 86400, json.dumps(data))
+            await self.cache.setex(cache_key, _INSIGHTS_CACHE_TTL, _pack_cached(data))
         
         return data
     
@@ -797,16 +994,16 @@ class MarketInsightsService:
         limit: int = 20,
     ) -> List[Dict]:
         """Get trending destinations."""
-        cache_key = f"insights:trending:{origin}:{limit}"
+        cache_key = _cache_key("trending", origin, limit)
         
         if self.cache:
             cached = await self.cache.get(cache_key)
             if cached:
-                import json
-                return json.loads(cached)
+                return _unpack_cached(cached)
         
+        # Select just the serialized columns; no ORM entities are built
         result = await self.db.execute(
-            select(TrendingDestination)
+            select(*_TRENDING_COLUMNS)
             .where(
                 TrendingDestination.origin_code == origin,
                 TrendingDestination.is_active == True
@@ -814,38 +1011,100 @@ class MarketInsightsService:
             .order_by(TrendingDestination.rank)
             .limit(limit)
         )
-        destinations = result.scalars().all()
-        
-        data = [
-            {
-                "destination_code": d.destination_code,
-                "destination_city": d.destination_city,
-                "destination_country": d.destination_country,
-                "trending_score": d.trending_score,
-                "travel_score": d.travel_score,
-                "booking_score": d.booking_score,
-                "score_change": d.score_change,
-                "rank": d.rank,
-                "tags": d.tags,
-            }
-            for d in destinations
-        ]
+        data = [dict(row) for row in result.mappings().all()]
         
         if self.cache and data:
-            import json
-            await self.cache.setex(cache_key, 3600, json.dumps(data))  # 1h cache for trending
+            await self.cache.setex(cache_key, _TRENDING_CACHE_TTL, _pack_cached(data))
         
         return data
     
-    async def _invalidate_insights_cache(self, insight_type: str):
-        """Invalidate cached insights data."""
+    async def get_trending_many(
+        self,
+        origins: List[str],
+        limit: int = 20,
+    ) -> Dict[str, List[Dict]]:
+        """
+        Get trending destinations for several origins at once.
+        
+        Uses the same cache keys as get_trending, but all lookups go out in
+        one pipelined round trip, all misses are loaded with one query and
+        the results are written back in a second pipeline.
+        """
+        origins = list(dict.fromkeys(origins))
+        results: Dict[str, List[Dict]] = {}
+        
+        if self.cache:
+            pipe = self.cache.pipeline(transaction=False)
+            for origin in origins:
+                pipe.get(_cache_key("trending", origin, limit))
+            for origin, cached in zip(origins, await pipe.execute()):
+                if cached:
+                    results[origin] = _unpack_cached(cached)
+        
+        missing = [origin for origin in origins if origin not in results]
+        if not missing:
+            return results
+        
+        result = await self.db.execute(
+            select(TrendingDestination.origin_code, *_TRENDING_COLUMNS)
+            .where(
+                TrendingDestination.origin_code.in_(missing),
+                TrendingDestination.is_active == True
+            )
+            .order_by(TrendingDestination.origin_code, TrendingDestination.rank)
+        )
+        
+        loaded: Dict[str, List[Dict]] = {origin: [] for origin in missing}
+        for row in result.mappings():
+            data = dict(row)
+            destinations = loaded[data.pop("origin_code")]
+            if len(destinations) < limit:
+                destinations.append(data)
+        
+        if self.cache:
+            pipe = self.cache.pipeline(transaction=False)
+            for origin, data in loaded.items():
+                if data:
+                    pipe.setex(_cache_key("trending", origin, limit), _TRENDING_CACHE_TTL, _pack_cached(data))
+            await pipe.execute()
+        
+        results.update(loaded)
+        return {origin: results[origin] for origin in origins}
+    
+    async def _invalidate_insights_cache(
+        self,
+        insight_type: str,
+        origins: Optional[List[str]] = None,
+    ):
+        """
+        Invalidate cached insights data.
+        
+        With origins, only keys for those origins (insights:{type}:{origin}:*)
+        are dropped, so cached data for origins a sync didn't touch stays warm.
+        
+        Keys are found with SCAN rather than KEYS, which would block Redis
+        while it walks the whole keyspace, and removed with UNLINK so the
+        memory is freed off Redis' main thread.
+        """
         if not self.cache:
             return
         
-        # Get all keys matching pattern
         pattern = f"insights:{insight_type}:*"
-        keys = await self.cache.keys(pattern)
+        origin_set = set(origins) if origins else None
+        deleted = 0
+        batch = []
+        
+        # One SCAN over the type's keys, filtered here, beats a SCAN per origin
+        async for key in self.cache.scan_iter(match=pattern, count=self.INVALIDATE_BATCH_SIZE):
+            if origin_set is not None and key.split(":", 3)[2] not in origin_set:
+                continue
+            batch.append(key)
+            if len(batch) >= self.INVALIDATE_BATCH_SIZE:
+                deleted += await self.cache.unlink(*batch)
+                batch = []
+        
+        if batch:
+            deleted += await self.cache.unlink(*batch)
         
-        if keys:
-            await self.cache.delete(*keys)
-            logger.info(f"Invalidated {len(keys)} cache keys for {insight_type}")
+        if deleted:
+            logger.info(f"Invalidated {deleted} cache keys for {insight_type}")
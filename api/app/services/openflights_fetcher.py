@@ -4,15 +4,170 @@ Fetches free/open airport, airline, and route data from OpenFlights.org
 This is useful for bulk seeding without API rate limits
 """
 import httpx
+import asyncio
 import csv
-import io
 import logging
-from typing import List, Dict, Any, Optional
+import re
+from typing import List, Dict, Any, Optional, AsyncIterator, Iterator, Sequence, Collection, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 logger = logging.getLogger(__name__)
 
+# OpenFlights' marker for a missing value
+_NULL = "\\N"
+
+try:
+    # Arrow's C++ CSV reader; much faster than csv.reader on whole files
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    """Coerce an OpenFlights numeric field; Arrow may have parsed it already"""
+    if value is None or value == "" or value == _NULL:
+        return None
+    return float(value)
+
+
+def _parse_csv_text(data: str, float_columns: Collection[int] = ()) -> Iterator[Sequence[Any]]:
+    """
+    Parse a fully downloaded OpenFlights file into rows.
+    
+    Columns are read as strings (with "\\N" left as-is) so rows look the
+    same as csv.reader's; malformed rows are skipped. With pyarrow, the
+    float_columns indexes are converted to float/None in C++ a whole batch
+    at a time; if they don't parse cleanly everything is read as strings.
+    """
+    if pa is None:
+        yield from csv.reader(data.splitlines())
+        return
+    
+    first_line = data[:data.find("\n")] if "\n" in data else data
+    column_count = len(next(csv.reader([first_line]), []))
+    if not column_count:
+        return
+    
+    column_names = [f"f{i}" for i in range(column_count)]
+    buffer = pa.py_buffer(data.encode("utf-8"))
+    
+    def read(typed: bool):
+        column_types = {
+            name: pa.float64() if typed and i in float_columns else pa.string()
+            for i, name in enumerate(column_names)
+        }
+        return pa_csv.read_csv(
+            buffer,
+            read_options=pa_csv.ReadOptions(column_names=column_names),
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=lambda row: "skip"),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types,
+                null_values=["", _NULL],
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+    
+    try:
+        table = read(typed=bool(float_columns))
+    except pa.ArrowInvalid as e:
+        logger.warning(f"Typed CSV parse failed, reading all columns as text: {e}")
+        table = read(typed=False)
+    
+    for batch in table.to_batches(max_chunksize=1000):
+        yield from zip(*(column.to_pylist() for column in batch.columns))
+
+
+# airports.dat latitude, longitude and altitude columns
+_AIRPORT_FLOAT_COLUMNS = frozenset({6, 7, 8})
+
+# Name heuristics for is_major / is_low_cost; matched against the lowercased
+# name in a single regex scan per row
+_MAJOR_AIRPORT_RE = re.compile("international|intl|main|primary|central")
+_LOW_COST_AIRLINE_RE = re.compile(
+    "ryan|easy|wizz|spirit|frontier|allegiant|vueling|pegasus|jet2|wow|norwegian"
+)
+
+# Upserts are sent as executemany batches, so they can't use RETURNING;
+# created/updated counts come from the table row count instead
+_UPSERT_AIRPORT = text("""
+    INSERT INTO airports (
+        iata_code, name, city, country,
+        country_code, latitude, longitude, altitude_ft,
+        timezone, is_major
+    ) VALUES (
+        :iata, :name, :city, :country,
+        :country_code, :lat, :lon, :alt, :tz, :is_major
+    )
+    ON CONFLICT (iata_code) DO UPDATE SET
+        name = COALESCE(EXCLUDED.name, airports.name),
+        city = COALESCE(EXCLUDED.city, airports.city),
+        country = COALESCE(EXCLUDED.country, airports.country),
+        country_code = COALESCE(NULLIF(EXCLUDED.country_code, ''), airports.country_code),
+        latitude = COALESCE(EXCLUDED.latitude, airports.latitude),
+        longitude = COALESCE(EXCLUDED.longitude, airports.longitude),
+        updated_at = NOW()
+""")
+
+_UPSERT_AIRLINE = text("""
+    INSERT INTO airlines (
+        iata_code, icao_code, name, country,
+        is_active, is_low_cost, logo_url
+    ) VALUES (
+        :iata, :icao, :name, :country,
+        :active, :low_cost, :logo
+    )
+    ON CONFLICT (iata_code) DO UPDATE SET
+        icao_code = COALESCE(EXCLUDED.icao_code, airlines.icao_code),
+        name = COALESCE(EXCLUDED.name, airlines.name),
+        country = COALESCE(EXCLUDED.country, airlines.country),
+        is_active = EXCLUDED.is_active,
+        updated_at = NOW()
+""")
+
+# Raw route rows are staged in a temp table (with COPY where the driver
+# supports it) and Postgres aggregates them per origin/destination; the
+# table lives only for the seeding transaction
+_CREATE_ROUTES_STAGE = text("""
+    CREATE TEMP TABLE _stage_routes (
+        airline text,
+        source text,
+        dest text,
+        stops int
+    ) ON COMMIT DROP
+""")
+
+_ROUTE_STAGE_COLUMNS = ["airline", "source", "dest", "stops"]
+
+# Fallback for drivers without COPY
+_INSERT_ROUTE_STAGE = text("""
+    INSERT INTO _stage_routes (airline, source, dest, stops)
+    VALUES (:airline, :source, :dest, :stops)
+""")
+
+# A route is direct unless some airline's record for it has stops
+_UPSERT_STAGED_ROUTES = text("""
+    INSERT INTO airport_destinations (
+        airport_code, destination_code,
+        airlines_serving, airline_count, is_direct
+    )
+    SELECT
+        source,
+        dest,
+        array_agg(DISTINCT airline),
+        count(DISTINCT airline),
+        NOT bool_or(COALESCE(stops, 0) > 0)
+    FROM _stage_routes
+    GROUP BY source, dest
+    ON CONFLICT (airport_code, destination_code) DO UPDATE SET
+        airlines_serving = EXCLUDED.airlines_serving,
+        airline_count = EXCLUDED.airline_count,
+        is_direct = EXCLUDED.is_direct OR airport_destinations.is_direct,
+        updated_at = NOW()
+""")
+
 
 class OpenFlightsDataFetcher:
     """
@@ -62,20 +217,101 @@ class OpenFlightsDataFetcher:
         "San Marino": "SM", "Vatican City": "VA", "Liechtenstein": "LI", "Faroe Islands": "FO",
     }
     
+    # Rows per executemany batch when seeding airports/airlines
+    BATCH_SIZE = 1000
+    
+    # Raw route rows per COPY into the staging table
+    ROUTES_STAGE_BATCH_SIZE = 10000
+    
+    # Text chunk size when streaming the .dat files; small chunks make
+    # httpx's per-chunk overhead dominate
+    STREAM_CHUNK_SIZE = 65536
+    
     def __init__(self, db: AsyncSession):
         self.db = db
         self.country_codes: Dict[str, str] = dict(self.COUNTRY_CODE_MAP)
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared HTTP client, creating it on first use.
+        
+        All files come from the same GitHub host, so one HTTP/2 client
+        does a single TLS handshake and multiplexes concurrent downloads.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=60.0,
+                limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60),
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
-    async def _load_country_codes(self):
+    async def _count_rows(self, table: str) -> int:
+        """Count rows in a seeded table (used to derive created/updated stats)"""
+        result = await self.db.execute(text(f"SELECT count(*) FROM {table}"))
+        return result.scalar_one()
+    
+    async def _stream_csv_rows(
+        self,
+        url: str,
+        timeout: float,
+        data: Optional[str] = None,
+        float_columns: Collection[int] = (),
+    ) -> AsyncIterator[Sequence[Any]]:
+        """
+        Stream an OpenFlights CSV file and yield rows as the download arrives.
+        
+        Only complete lines are parsed; the trailing partial line of each
+        chunk is carried over to the next one. If the file was already
+        downloaded (see seed_all), pass its contents as data instead.
+        """
+        if data is not None:
+            for row in _parse_csv_text(data, float_columns):
+                yield row
+            return
+        
+        async with self._get_client().stream("GET", url, timeout=timeout) as response:
+            response.raise_for_status()
+            
+            buffer = ""
+            async for chunk in response.aiter_text(chunk_size=self.STREAM_CHUNK_SIZE):
+                buffer += chunk
+                if "\n" not in buffer:
+                    continue
+                
+                lines, buffer = buffer.rsplit("\n", 1)
+                for row in csv.reader(lines.split("\n")):
+                    yield row
+            
+            if buffer:
+                for row in csv.reader([buffer]):
+                    yield row
+    
+    def _log_failed_rows(self, kind: str, failed: List[Tuple[int, str]]):
+        """Log one summary line for rows that failed to parse"""
+        if not failed:
+            return
+        sample = ", ".join(f"row {number} ({key})" for number, key in failed[:5])
+        logger.warning(f"Skipped {len(failed)} malformed {kind} rows, e.g. {sample}")
+    
+    async def _fetch_text(self, url: str) -> str:
+        """Download an OpenFlights file in full"""
+        response = await self._get_client().get(url)
+        response.raise_for_status()
+        return response.text
+    
+    async def _load_country_codes(self, data: Optional[str] = None):
         """Load country codes from OpenFlights countries.dat"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(self.COUNTRIES_URL)
-                response.raise_for_status()
-            
             # Format: name, iso_code, dafif_code
-            reader = csv.reader(io.StringIO(response.text))
-            for row in reader:
+            async for row in self._stream_csv_rows(self.COUNTRIES_URL, timeout=30.0, data=data):
                 if len(row) >= 2:
                     name, iso_code = row[0], row[1]
                     if name and iso_code:
@@ -85,13 +321,9 @@ class OpenFlightsDataFetcher:
         except Exception as e:
             logger.warning(f"Could not load country codes from OpenFlights: {e}")
     
-    def _get_country_code(self, country_name: str) -> str:
-        """Get ISO country code from country name"""
-        if not country_name:
-            return ""
-        return self.country_codes.get(country_name, "")
-    
-    async def fetch_and_seed_airports(self) -> Dict[str, int]:
+    async def fetch_and_seed_airports(
+        self, data: Optional[str] = None, countries_data: Optional[str] = None
+    ) -> Dict[str, int]:
         """
         Fetch airports from OpenFlights and seed to database
         Returns stats: {fetched, created, updated}
@@ -99,286 +331,210 @@ class OpenFlightsDataFetcher:
         logger.info("Fetching airports from OpenFlights...")
         
         # Load country codes first
-        await self._load_country_codes()
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(self.AIRPORTS_URL)
-            response.raise_for_status()
+        await self._load_country_codes(countries_data)
         
         # OpenFlights airports.dat format:
         # Airport ID, Name, City, Country, IATA, ICAO, Lat, Lon, Alt, Timezone, DST, Tz database, Type, Source
-        reader = csv.reader(io.StringIO(response.text))
-        
         stats = {"fetched": 0, "created": 0, "updated": 0, "skipped": 0}
+        rows_before = await self._count_rows("airports")
+        rows_sent = 0
+        batch: List[Dict[str, Any]] = []
+        failed: List[Tuple[int, str]] = []
+        country_code_get = self.country_codes.get
+        row_number = 0
         
-        for row in reader:
-            try:
-                if len(row) < 12:
-                    continue
-                    
-                airport_id, name, city, country, iata, icao, lat, lon, alt, tz_offset, dst, tz_db = row[:12]
-                
-                # Skip airports without IATA codes or invalid codes
-                if not iata or iata == "\\N" or len(iata) != 3:
-                    continue
-                
-                stats["fetched"] += 1
-                
-                # Determine if major airport (rough heuristic based on name)
-                is_major = any(keyword in name.lower() for keyword in [
-                    "international", "intl", "main", "primary", "central"
-                ])
-                
-                # Get country code from mapping
-                country_code = self._get_country_code(country)
-                
-                # Insert/update airport - skip ICAO to avoid unique conflicts
-                # Some airports share ICAO or have NULL ICAO
-                result = await self.db.execute(text("""
-                    INSERT INTO airports (
-                        iata_code, name, city, country,
-                        country_code, latitude, longitude, altitude_ft,
-                        timezone, is_major
-                    ) VALUES (
-                        :iata, :name, :city, :country,
-                        :country_code, :lat, :lon, :alt, :tz, :is_major
-                    )
-                    ON CONFLICT (iata_code) DO UPDATE SET
-                        name = COALESCE(EXCLUDED.name, airports.name),
-                        city = COALESCE(EXCLUDED.city, airports.city),
-                        country = COALESCE(EXCLUDED.country, airports.country),
-                        country_code = COALESCE(NULLIF(EXCLUDED.country_code, ''), airports.country_code),
-                        latitude = COALESCE(EXCLUDED.latitude, airports.latitude),
-                        longitude = COALESCE(EXCLUDED.longitude, airports.longitude),
-                        updated_at = NOW()
-                    RETURNING (xmax = 0) AS is_insert
-                """), {
-                    "iata": iata,
-                    "name": name,
-                    "city": city,
-                    "country": country,
-                    "country_code": country_code,
-                    "lat": float(lat) if lat and lat != "\\N" else None,
-                    "lon": float(lon) if lon and lon != "\\N" else None,
-                    "alt": int(float(alt)) if alt and alt != "\\N" else None,
-                    "tz": tz_db if tz_db and tz_db != "\\N" else None,
-                    "is_major": is_major
-                })
+        async for row in self._stream_csv_rows(
+            self.AIRPORTS_URL, timeout=60.0, data=data, float_columns=_AIRPORT_FLOAT_COLUMNS
+        ):
+            row_number += 1
+            if len(row) < 12:
+                continue
                 
-                row_result = result.fetchone()
-                if row_result and row_result[0]:
-                    stats["created"] += 1
-                else:
-                    stats["updated"] += 1
-                    
-            except Exception as e:
-                logger.error(f"Error processing airport row: {e}")
-                stats["skipped"] += 1
+            airport_id, name, city, country, iata, icao, lat, lon, alt, tz_offset, dst, tz_db = row[:12]
+            
+            # Skip airports without IATA codes or invalid codes
+            if not iata or iata == _NULL or len(iata) != 3:
                 continue
+            
+            # Coordinates are the only fields that can fail to parse
+            try:
+                latitude = _optional_float(lat)
+                longitude = _optional_float(lon)
+                altitude = _optional_float(alt)
+            except ValueError:
+                failed.append((row_number, iata))
+                continue
+            
+            stats["fetched"] += 1
+            
+            # Determine if major airport (rough heuristic based on name)
+            is_major = _MAJOR_AIRPORT_RE.search(name.lower()) is not None
+            
+            # Get country code from mapping
+            country_code = country_code_get(country, "") if country else ""
+            
+            # Insert/update airport - skip ICAO to avoid unique conflicts
+            # Some airports share ICAO or have NULL ICAO
+            batch.append({
+                "iata": iata,
+                "name": name,
+                "city": city,
+                "country": country,
+                "country_code": country_code,
+                "lat": latitude,
+                "lon": longitude,
+                "alt": int(altitude) if altitude is not None else None,
+                "tz": tz_db if tz_db and tz_db != _NULL else None,
+                "is_major": is_major
+            })
+            
+            if len(batch) >= self.BATCH_SIZE:
+                await self.db.execute(_UPSERT_AIRPORT, batch)
+                rows_sent += len(batch)
+                batch = []
+        
+        if batch:
+            await self.db.execute(_UPSERT_AIRPORT, batch)
+            rows_sent += len(batch)
+        
+        stats["skipped"] = len(failed)
+        self._log_failed_rows("airport", failed)
+        
+        stats["created"] = await self._count_rows("airports") - rows_before
+        stats["updated"] = rows_sent - stats["created"]
         
         await self.db.commit()
         logger.info(f"Airports seeding complete: {stats}")
         return stats
     
-    async def fetch_and_seed_airlines(self) -> Dict[str, int]:
+    async def fetch_and_seed_airlines(self, data: Optional[str] = None) -> Dict[str, int]:
         """
         Fetch airlines from OpenFlights and seed to database
         """
         logger.info("Fetching airlines from OpenFlights...")
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(self.AIRLINES_URL)
-            response.raise_for_status()
-        
         # OpenFlights airlines.dat format:
         # Airline ID, Name, Alias, IATA, ICAO, Callsign, Country, Active
-        reader = csv.reader(io.StringIO(response.text))
-        
         stats = {"fetched": 0, "created": 0, "updated": 0, "skipped": 0}
+        rows_before = await self._count_rows("airlines")
+        rows_sent = 0
+        batch: List[Dict[str, Any]] = []
         
-        for row in reader:
-            try:
-                if len(row) < 8:
-                    continue
-                    
-                airline_id, name, alias, iata, icao, callsign, country, active = row[:8]
-                
-                # Skip airlines without valid IATA codes
-                if not iata or iata == "\\N" or iata == "-" or len(iata) != 2:
-                    continue
-                
-                stats["fetched"] += 1
-                
-                is_active = active == "Y"
-                
-                # Determine if low-cost carrier (rough heuristic)
-                is_low_cost = any(keyword in name.lower() for keyword in [
-                    "ryan", "easy", "wizz", "spirit", "frontier", "allegiant",
-                    "vueling", "pegasus", "jet2", "wow", "norwegian"
-                ])
-                
-                result = await self.db.execute(text("""
-                    INSERT INTO airlines (
-                        iata_code, icao_code, name, country,
-                        is_active, is_low_cost, logo_url
-                    ) VALUES (
-                        :iata, :icao, :name, :country,
-                        :active, :low_cost, :logo
-                    )
-                    ON CONFLICT (iata_code) DO UPDATE SET
-                        icao_code = COALESCE(EXCLUDED.icao_code, airlines.icao_code),
-                        name = COALESCE(EXCLUDED.name, airlines.name),
-                        country = COALESCE(EXCLUDED.country, airlines.country),
-                        is_active = EXCLUDED.is_active,
-                        updated_at = NOW()
-                    RETURNING (xmax = 0) AS is_insert
-                """), {
-                    "iata": iata,
-                    "icao": icao if icao != "\\N" else None,
-                    "name": name,
-                    "country": country if country != "\\N" else None,
-                    "active": is_active,
-                    "low_cost": is_low_cost,
-                    "logo": f"https://pics.avs.io/100/100/{iata}.png"
-                })
+        # Every field is used as text, so validation is all explicit checks
+        async for row in self._stream_csv_rows(self.AIRLINES_URL, timeout=60.0, data=data):
+            if len(row) < 8:
+                continue
                 
-                row_result = result.fetchone()
-                if row_result and row_result[0]:
-                    stats["created"] += 1
-                else:
-                    stats["updated"] += 1
-                    
-            except Exception as e:
-                logger.error(f"Error processing airline row: {e}")
-                stats["skipped"] += 1
+            airline_id, name, alias, iata, icao, callsign, country, active = row[:8]
+            
+            # Skip airlines without valid IATA codes
+            if not iata or iata == _NULL or iata == "-" or len(iata) != 2:
                 continue
+            
+            stats["fetched"] += 1
+            
+            is_active = active == "Y"
+            
+            # Determine if low-cost carrier (rough heuristic)
+            is_low_cost = _LOW_COST_AIRLINE_RE.search(name.lower()) is not None
+            
+            batch.append({
+                "iata": iata,
+                "icao": icao if icao != _NULL else None,
+                "name": name,
+                "country": country if country != _NULL else None,
+                "active": is_active,
+                "low_cost": is_low_cost,
+                "logo": f"https://pics.avs.io/100/100/{iata}.png"
+            })
+            
+            if len(batch) >= self.BATCH_SIZE:
+                await self.db.execute(_UPSERT_AIRLINE, batch)
+                rows_sent += len(batch)
+                batch = []
+        
+        if batch:
+            await self.db.execute(_UPSERT_AIRLINE, batch)
+            rows_sent += len(batch)
+        
+        stats["created"] = await self._count_rows("airlines") - rows_before
+        stats["updated"] = rows_sent - stats["created"]
         
         await self.db.commit()
         logger.info(f"Airlines seeding complete: {stats}")
         return stats
     
-    async def fetch_and_seed_routes(self) -> Dict[str, int]:
+    async def fetch_and_seed_routes(self, data: Optional[str] = None) -> Dict[str, int]:
         """
         Fetch routes from OpenFlights and seed to database
         """
         logger.info("Fetching routes from OpenFlights...")
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(self.ROUTES_URL)
-            response.raise_for_status()
-        
         # OpenFlights routes.dat format:
         # Airline, Airline ID, Source airport, Source airport ID, 
         # Dest airport, Dest airport ID, Codeshare, Stops, Equipment
-        reader = csv.reader(io.StringIO(response.text))
-        
         stats = {"fetched": 0, "created": 0, "updated": 0, "skipped": 0}
         
-        # Aggregate routes to find airlines serving each route
-        routes_dict: Dict[str, Dict[str, Any]] = {}
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        copy_records = getattr(raw_connection.driver_connection, "copy_records_to_table", None)
         
-        for row in reader:
-            try:
-                if len(row) < 9:
-                    continue
-                    
-                airline, airline_id, source, source_id, dest, dest_id, codeshare, stops, equipment = row[:9]
-                
-                # Skip invalid data
-                if not source or source == "\\N" or len(source) != 3:
-                    continue
-                if not dest or dest == "\\N" or len(dest) != 3:
-                    continue
-                if not airline or airline == "\\N" or len(airline) > 3:
-                    continue
-                
-                stats["fetched"] += 1
-                
-                route_key = f"{source}-{dest}"
-                
-                if route_key not in routes_dict:
-                    routes_dict[route_key] = {
-                        "origin_code": source,
-                        "destination_code": dest,
-                        "airlines": set(),
-                        "is_direct": True,
-                        "equipment": set()
-                    }
-                
-                routes_dict[route_key]["airlines"].add(airline)
-                if equipment and equipment != "\\N":
-                    for eq in equipment.split(" "):
-                        routes_dict[route_key]["equipment"].add(eq)
-                
-                # Check if any version has stops
-                if stops and stops != "\\N" and int(stops) > 0:
-                    routes_dict[route_key]["is_direct"] = False
-                    
-            except Exception as e:
-                logger.debug(f"Error processing route row: {e}")
-                stats["skipped"] += 1
-                continue
+        async def stage(batch: List[tuple]):
+            if copy_records is not None:
+                await copy_records("_stage_routes", records=batch, columns=_ROUTE_STAGE_COLUMNS)
+            else:
+                await self.db.execute(
+                    _INSERT_ROUTE_STAGE,
+                    [dict(zip(_ROUTE_STAGE_COLUMNS, record)) for record in batch],
+                )
         
-        # Log aggregation results
-        logger.info(f"Aggregated {len(routes_dict)} unique routes from {stats['fetched']} records (skipped {stats['skipped']} invalid)")
+        await self.db.execute(_CREATE_ROUTES_STAGE)
+        batch: List[tuple] = []
+        failed: List[Tuple[int, str]] = []
+        row_number = 0
         
-        if routes_dict:
-            sample_route = list(routes_dict.items())[0]
-            logger.info(f"Sample route: {sample_route[0]} = {sample_route[1]}")
+        async for row in self._stream_csv_rows(self.ROUTES_URL, timeout=60.0, data=data):
+            row_number += 1
+            if len(row) < 9:
+                continue
+                
+            airline, airline_id, source, source_id, dest, dest_id, codeshare, stops, equipment = row[:9]
+            
+            # Skip invalid data
+            if not source or source == _NULL or len(source) != 3:
+                continue
+            if not dest or dest == _NULL or len(dest) != 3:
+                continue
+            if not airline or airline == _NULL or len(airline) > 3:
+                continue
+            
+            if not stops or stops == _NULL:
+                stops = None
+            elif stops.isdigit():
+                stops = int(stops)
+            else:
+                failed.append((row_number, f"{source}-{dest}"))
+                continue
+            
+            stats["fetched"] += 1
+            batch.append((airline, source, dest, stops))
+            
+            if len(batch) >= self.ROUTES_STAGE_BATCH_SIZE:
+                await stage(batch)
+                batch = []
         
-        # Insert aggregated routes
-        logger.info(f"Inserting {len(routes_dict)} unique routes...")
+        if batch:
+            await stage(batch)
         
-        insert_count = 0
-        error_count = 0
+        stats["skipped"] = len(failed)
+        self._log_failed_rows("route", failed)
+        logger.info(f"Staged {stats['fetched']} route records (skipped {stats['skipped']} invalid)")
         
-        for route_key, route_data in routes_dict.items():
-            try:
-                airlines_list = list(route_data["airlines"])
-                
-                if insert_count == 0:
-                    logger.info(f"First route to insert: {route_key} - airlines: {airlines_list}")
-                
-                # Also populate airport_destinations (denormalized)
-                # Use raw SQL with escaped array literal to avoid parameter binding issues
-                airlines_array_literal = "'{" + ",".join(airlines_list) + "}'" if airlines_list else "'{}'"
-                origin_code = route_data["origin_code"]
-                dest_code = route_data["destination_code"]
-                is_direct = route_data["is_direct"]
-                airline_count = len(airlines_list)
-                
-                # Use raw SQL without parameters for array
-                sql = f"""
-                    INSERT INTO airport_destinations (
-                        airport_code, destination_code,
-                        airlines_serving, airline_count, is_direct
-                    ) VALUES (
-                        '{origin_code}', '{dest_code}', {airlines_array_literal}, {airline_count}, {is_direct}
-                    )
-                    ON CONFLICT (airport_code, destination_code) DO UPDATE SET
-                        airlines_serving = EXCLUDED.airlines_serving,
-                        airline_count = EXCLUDED.airline_count,
-                        is_direct = EXCLUDED.is_direct OR airport_destinations.is_direct,
-                        updated_at = NOW()
-                """
-                await self.db.execute(text(sql))
-                
-                stats["created"] += 1
-                insert_count += 1
-                
-                # Log progress every 1000 routes
-                if insert_count % 1000 == 0:
-                    logger.info(f"Inserted {insert_count} routes so far...")
-                
-            except Exception as e:
-                error_count += 1
-                if error_count <= 5:  # Only log first 5 errors
-                    print(f"ERROR inserting route {route_key}: {type(e).__name__}: {e}", flush=True)
-                    logger.error(f"Error inserting route {route_key}: {type(e).__name__}: {e}")
-                stats["skipped"] += 1
-                continue
+        # Aggregate airlines per route and upsert in one statement
+        result = await self.db.execute(_UPSERT_STAGED_ROUTES)
+        stats["created"] = result.rowcount
         
-        logger.info(f"Insert phase complete: {insert_count} inserted, {error_count} errors")
+        logger.info(f"Insert phase complete: {stats['created']} routes upserted")
         await self.db.commit()
         logger.info(f"Routes seeding complete: {stats}")
         return stats
@@ -412,11 +568,24 @@ class OpenFlightsDataFetcher:
     async def seed_all(self) -> Dict[str, Any]:
         """
         Seed all data: airports, airlines, routes
+        
+        The four files are downloaded concurrently over the shared client;
+        the inserts then run one after another since they share self.db.
         """
+        try:
+            countries_text, airports_text, airlines_text, routes_text = await asyncio.gather(
+                self._fetch_text(self.COUNTRIES_URL),
+                self._fetch_text(self.AIRPORTS_URL),
+                self._fetch_text(self.AIRLINES_URL),
+                self._fetch_text(self.ROUTES_URL),
+            )
+        finally:
+            await self.close()
+        
         results = {
-            "airports": await self.fetch_and_seed_airports(),
-            "airlines": await self.fetch_and_seed_airlines(),
-            "routes": await self.fetch_and_seed_routes(),
+            "airports": await self.fetch_and_seed_airports(airports_text, countries_text),
+            "airlines": await self.fetch_and_seed_airlines(airlines_text),
+            "routes": await self.fetch_and_seed_routes(routes_text),
         }
         
         # Update city info
@@ -2,19 +2,86 @@
 Amadeus Flight Provider - Primary flight data source
 https://developers.amadeus.com/
 """
-from typing import List, Optional
-from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple, ClassVar
+from datetime import date, datetime
+from functools import lru_cache
+import asyncio
 import httpx
 import logging
-import re
+import orjson
+import time
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.config import settings
 from app.schemas.flight import FlightOffer, FlightSegment
+from app.utils.memory_cache import TTLCache
 from .base import FlightProvider, ProviderError
 
 logger = logging.getLogger(__name__)
 
+# Our cabin classes -> Amadeus travelClass values
+_CABIN_MAP = {
+    "economy": "ECONOMY",
+    "premium_economy": "PREMIUM_ECONOMY",
+    "business": "BUSINESS",
+    "first": "FIRST",
+}
+
+try:
+    # C parser; handles a trailing "Z" without patching the string first
+    from ciso8601 import parse_datetime as _parse_datetime
+except ImportError:
+    # fromisoformat accepts a trailing "Z" natively (Python 3.11+)
+    _parse_datetime = datetime.fromisoformat
+
+try:
+    # yajl2 C backend: offers are decoded as the body streams in, without
+    # holding the raw body and the whole decoded tree at the same time
+    import ijson.backends.yajl2_c as ijson
+except ImportError:
+    ijson = None
+
+
+class _AsyncResponseReader:
+    """Adapt a streamed httpx response to the async read() ijson expects"""
+    
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+    
+    async def read(self, size: int = -1) -> bytes:
+        return await anext(self._chunks, b"")
+
+
+@lru_cache(maxsize=2048)
+def _parse_duration(duration_str: str) -> int:
+    """
+    Parse ISO 8601 duration to minutes (e.g. "PT2H35M", "P1DT3H").
+    
+    Single character scan instead of a regex, memoized because the same
+    handful of segment durations repeat across every offer in a response.
+    """
+    minutes = 0
+    value = 0
+    fraction = False
+    for ch in duration_str:
+        if "0" <= ch <= "9":
+            if not fraction:
+                value = value * 10 + ord(ch) - 48
+        elif ch == ".":
+            # Fractional part of a unit is truncated
+            fraction = True
+        else:
+            if ch == "D":
+                minutes += value * 1440
+            elif ch == "H":
+                minutes += value * 60
+            elif ch == "M":
+                minutes += value
+            # "P"/"T" designators and seconds ("S") contribute nothing
+            value = 0
+            fraction = False
+    return minutes
+
 
 class AmadeusProvider(FlightProvider):
     """
@@ -29,10 +96,24 @@ class AmadeusProvider(FlightProvider):
     requests_per_minute = 30  # Free tier limit
     requests_per_day = 2000   # Free tier: ~2000/month
     
+    # Short-lived cache of parsed search results (offers are stable for minutes)
+    SEARCH_CACHE_TTL = 120  # seconds
+    SEARCH_CACHE_SIZE = 2048
+    
+    # Connection attempts retried by the HTTP transport before giving up
+    CONNECT_RETRIES = 2
+    
+    # OAuth token shared by every provider instance in the process, so
+    # separate instances don't each spend a token request
+    _token: ClassVar[Optional[str]] = None
+    _token_deadline: ClassVar[float] = 0.0  # time.monotonic() deadline
+    _token_lock: ClassVar[Optional[asyncio.Lock]] = None
+    _token_lock_loop: ClassVar[Optional[asyncio.AbstractEventLoop]] = None
+    
     def __init__(self):
         super().__init__()
-        self._token: Optional[str] = None
-        self._token_expiry: Optional[datetime] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._search_cache = TTLCache(self.SEARCH_CACHE_SIZE, self.SEARCH_CACHE_TTL)
     
     @property
     def is_configured(self) -> bool:
@@ -44,31 +125,78 @@ class AmadeusProvider(FlightProvider):
         """Get API base URL (test or production)"""
         return settings.AMADEUS_BASE_URL
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared HTTP client, creating it on first use.
+        
+        Reusing one client keeps TLS connections to Amadeus alive between
+        requests and lets concurrent searches multiplex over HTTP/2. Offer
+        JSON compresses well, so gzip/brotli bodies are requested. Failed
+        connection attempts are retried by the transport itself.
+        """
+        if self._client is None:
+            # http2/limits must be set on the transport once one is supplied
+            transport = httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=self.CONNECT_RETRIES,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+            self._client = httpx.AsyncClient(
+                transport=transport,
+                headers={"Accept-Encoding": "gzip, br"},
+                timeout=httpx.Timeout(30.0, connect=5.0),
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @classmethod
+    def _get_token_lock(cls) -> asyncio.Lock:
+        """Get the class-wide token lock for the running event loop"""
+        # A lock is tied to one loop; Celery tasks each run a fresh one
+        loop = asyncio.get_running_loop()
+        if cls._token_lock is None or cls._token_lock_loop is not loop:
+            cls._token_lock = asyncio.Lock()
+            cls._token_lock_loop = loop
+        return cls._token_lock
+    
     async def _get_token(self) -> str:
         """Get or refresh OAuth access token"""
-        if self._token and self._token_expiry and datetime.utcnow() < self._token_expiry:
-            return self._token
-        
-        auth_url = self.base_url.replace("/v2", "/v1/security/oauth2/token")
+        cls = type(self)
+        if cls._token and time.monotonic() < cls._token_deadline:
+            return cls._token
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                auth_url,
-                data={
-                    "grant_type": "client_credentials",
-                    "client_id": settings.AMADEUS_API_KEY,
-                    "client_secret": settings.AMADEUS_API_SECRET,
-                },
-                timeout=10.0,
-            )
-            response.raise_for_status()
-            data = response.json()
+        # Only one coroutine refreshes; concurrent callers wait for its token
+        async with self._get_token_lock():
+            if cls._token and time.monotonic() < cls._token_deadline:
+                return cls._token
             
-            self._token = data["access_token"]
-            self._token_expiry = datetime.utcnow() + timedelta(seconds=data["expires_in"] - 60)
+            data = await self._fetch_token()
+            cls._token = data["access_token"]
+            cls._token_deadline = time.monotonic() + data["expires_in"] - 60
             
-            return self._token
+            return cls._token
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    async def _fetch_token(self) -> dict:
+        """Request a new OAuth access token (retried on failure)"""
+        auth_url = self.base_url.replace("/v2", "/v1/security/oauth2/token")
+        
+        response = await self._get_client().post(
+            auth_url,
+            data={
+                "grant_type": "client_credentials",
+                "client_id": settings.AMADEUS_API_KEY,
+                "client_secret": settings.AMADEUS_API_SECRET,
+            },
+            timeout=10.0,
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
     
     async def search(
         self,
@@ -78,17 +206,25 @@ class AmadeusProvider(FlightProvider):
         return_date: Optional[date] = None,
         passengers: int = 1,
         cabin_class: str = "economy",
+        direct_only: bool = False,
     ) -> List[FlightOffer]:
         """Search flights using Amadeus Flight Offers Search API"""
         if not self.is_configured:
             raise ProviderError(self.name, "Amadeus API credentials not configured")
         
+        cache_key = (
+            origin, destination, departure_date, return_date,
+            passengers, cabin_class, direct_only,
+        )
+        cached_offers = self._search_cache.get(cache_key)
+        if cached_offers is not None:
+            logger.debug(f"Amadeus search cache HIT for {origin}->{destination}")
+            return list(cached_offers)
+        
         try:
-            token = await self._get_token()
-            
             params = {
-                "originLocationCode": origin.upper(),
-                "destinationLocationCode": destination.upper(),
+                "originLocationCode": origin,
+                "destinationLocationCode": destination,
                 "departureDate": departure_date.isoformat(),
                 "adults": passengers,
                 "currencyCode": "EUR",
@@ -98,28 +234,23 @@ class AmadeusProvider(FlightProvider):
             if return_date:
                 params["returnDate"] = return_date.isoformat()
             
-            cabin_map = {
-                "economy": "ECONOMY",
-                "premium_economy": "PREMIUM_ECONOMY",
-                "business": "BUSINESS",
-                "first": "FIRST",
-            }
-            params["travelClass"] = cabin_map.get(cabin_class, "ECONOMY")
+            if direct_only:
+                params["nonStop"] = "true"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/shopping/flight-offers",
-                    params=params,
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=30.0,
-                )
-                response.raise_for_status()
-                data = response.json()
+            params["travelClass"] = _CABIN_MAP.get(cabin_class, "ECONOMY")
             
-            offers = self._parse_response(data)
+            data = await self._fetch_offers(params)
+            offers_data = data.get("data")
+            if offers_data:
+                # Building the offer models is pure CPU; keep it off the event loop
+                offers = await asyncio.to_thread(self._parse_response, offers_data, direct_only)
+            else:
+                # Empty or error-shaped payload: skip the worker thread hop
+                offers = []
+            self._search_cache.set(cache_key, offers)
             self.record_success()
             logger.info(f"Amadeus returned {len(offers)} offers for {origin}->{destination}")
-            return offers
+            return list(offers)
             
         except httpx.HTTPStatusError as e:
             self.record_failure(e)
@@ -128,79 +259,121 @@ class AmadeusProvider(FlightProvider):
             self.record_failure(e)
             raise ProviderError(self.name, str(e), e)
     
-    def _parse_response(self, data: dict) -> List[FlightOffer]:
-        """Parse Amadeus API response"""
+    async def _fetch_offers(self, params: dict) -> dict:
+        """
+        Fetch and decode a Flight Offers Search response.
+        
+        Kept apart from parsing so the raw response body is released as
+        soon as it is decoded, instead of staying alive while offer models
+        are built from it.
+        
+        With ijson's C backend the offers under "data" are decoded while
+        the body streams in and the rest of the document (dictionaries,
+        meta) is never built. Otherwise the body is decoded with orjson in
+        a worker thread.
+        """
+        token = await self._get_token()
+        url = f"{self.base_url}/shopping/flight-offers"
+        headers = {"Authorization": f"Bearer {token}"}
+        
+        if ijson is None:
+            response = await self._get_client().get(url, params=params, headers=headers)
+            response.raise_for_status()
+            return await asyncio.to_thread(orjson.loads, response.content)
+        
+        async with self._get_client().stream("GET", url, params=params, headers=headers) as response:
+            if response.is_error:
+                # Read the body so the error handler can include it
+                await response.aread()
+                response.raise_for_status()
+            
+            offers = [
+                offer
+                async for offer in ijson.items(
+                    _AsyncResponseReader(response), "data.item", use_float=True
+                )
+            ]
+        return {"data": offers}
+    
+    def _parse_response(self, offers_data: list, direct_only: bool = False) -> List[FlightOffer]:
+        """
+        Parse the offers list ("data") of an Amadeus API response.
+        
+        With direct_only, multi-segment offers are skipped before any
+        segment or offer models are built. Models are created with
+        model_construct: every field is already typed here, so pydantic
+        validation would only repeat work.
+        """
         offers = []
         
-        for offer_data in data.get("data", []):
+        for offer_data in offers_data:
+            itineraries = offer_data.get("itineraries") or []
+            price_data = offer_data.get("price") or {}
+            if not itineraries or "total" not in price_data:
+                continue
+            
+            outbound_data = itineraries[0].get("segments", [])
+            if direct_only and len(outbound_data) != 1:
+                continue
+            
+            traveler_pricings = offer_data.get("travelerPricings") or [{}]
+            fare_details = traveler_pricings[0].get("fareDetailsBySegment") or [{}]
+            cabin_class = fare_details[0].get("cabin", "ECONOMY")
+            
+            # Only value conversion and segment field access can still fail
             try:
-                itineraries = offer_data.get("itineraries", [])
-                if not itineraries:
-                    continue
+                price = float(price_data["total"])
                 
                 # Parse outbound segments
-                outbound_segments = self._parse_segments(itineraries[0].get("segments", []))
+                outbound_segments, total_duration = self._parse_segments(outbound_data)
                 
                 # Parse return segments if exists
                 return_segments = None
                 if len(itineraries) > 1:
-                    return_segments = self._parse_segments(itineraries[1].get("segments", []))
-                
-                # Calculate total duration
-                total_duration = sum(s.duration_minutes for s in outbound_segments)
-                if return_segments:
-                    total_duration += sum(s.duration_minutes for s in return_segments)
-                
-                price = float(offer_data["price"]["total"])
-                
-                offer = FlightOffer(
-                    id=f"amadeus-{offer_data['id']}",
-                    price=price,
-                    currency=offer_data["price"]["currency"],
-                    cabin_class=offer_data["travelerPricings"][0]["fareDetailsBySegment"][0]["cabin"],
-                    airline=outbound_segments[0].airline if outbound_segments else "Unknown",
-                    outbound_segments=outbound_segments,
-                    return_segments=return_segments,
-                    total_duration_minutes=total_duration,
-                    stops=len(outbound_segments) - 1,
-                    is_direct=len(outbound_segments) == 1,
-                    source="amadeus",
-                )
-                offers.append(offer)
-                
-            except Exception as e:
-                logger.warning(f"Failed to parse Amadeus offer: {e}")
+                    return_segments, return_duration = self._parse_segments(
+                        itineraries[1].get("segments", [])
+                    )
+                    total_duration += return_duration
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Failed to parse Amadeus offer {offer_data.get('id')}: {e!r}")
                 continue
+            
+            offers.append(FlightOffer.model_construct(
+                id="amadeus-" + offer_data.get("id", ""),
+                price=price,
+                currency=price_data.get("currency", "EUR"),
+                cabin_class=cabin_class,
+                airline=outbound_segments[0].airline if outbound_segments else "Unknown",
+                outbound_segments=outbound_segments,
+                return_segments=return_segments,
+                total_duration_minutes=total_duration,
+                stops=len(outbound_segments) - 1,
+                is_direct=len(outbound_segments) == 1,
+                source="amadeus",
+            ))
         
         return offers
     
-    def _parse_segments(self, segments_data: list) -> List[FlightSegment]:
-        """Parse flight segments"""
+    def _parse_segments(self, segments_data: list) -> Tuple[List[FlightSegment], int]:
+        """Parse flight segments, returning them with their total duration in minutes"""
         segments = []
+        total_minutes = 0
         for seg in segments_data:
             duration_str = seg.get("duration", "PT0H0M")
-            duration_minutes = self._parse_duration(duration_str)
+            duration_minutes = _parse_duration(duration_str)
+            total_minutes += duration_minutes
             
-            segments.append(FlightSegment(
+            segments.append(FlightSegment.model_construct(
                 departure_airport=seg["departure"]["iataCode"],
                 arrival_airport=seg["arrival"]["iataCode"],
-                departure_time=datetime.fromisoformat(seg["departure"]["at"].replace("Z", "+00:00")),
-                arrival_time=datetime.fromisoformat(seg["arrival"]["at"].replace("Z", "+00:00")),
-                flight_number=f"{seg['carrierCode']}{seg['number']}",
+                departure_time=_parse_datetime(seg["departure"]["at"]),
+                arrival_time=_parse_datetime(seg["arrival"]["at"]),
+                flight_number=seg["carrierCode"] + seg["number"],
                 airline=seg["carrierCode"],
                 duration_minutes=duration_minutes,
                 aircraft=seg.get("aircraft", {}).get("code"),
             ))
-        return segments
-    
-    def _parse_duration(self, duration_str: str) -> int:
-        """Parse ISO 8601 duration to minutes"""
-        match = re.match(r'PT(?:(\d+)H)?(?:(\d+)M)?', duration_str)
-        if match:
-            hours = int(match.group(1) or 0)
-            minutes = int(match.group(2) or 0)
-            return hours * 60 + minutes
-        return 0
+        return segments, total_minutes
     
     async def get_price_calendar(
         self,
@@ -216,28 +389,26 @@ class AmadeusProvider(FlightProvider):
         try:
             token = await self._get_token()
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/shopping/flight-destinations",
-                    params={
-                        "origin": origin.upper(),
-                        "destination": destination.upper(),
-                        "departureDate": f"{year}-{month:02d}-01",
-                    },
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=30.0,
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return [
-                        {
-                            "date": item.get("departureDate"),
-                            "price": float(item.get("price", {}).get("total", 0)),
-                            "currency": item.get("price", {}).get("currency", "EUR"),
-                        }
-                        for item in data.get("data", [])
-                    ]
+            response = await self._get_client().get(
+                f"{self.base_url}/shopping/flight-destinations",
+                params={
+                    "origin": origin,
+                    "destination": destination,
+                    "departureDate": f"{year}-{month:02d}-01",
+                },
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                return [
+                    {
+                        "date": item.get("departureDate"),
+                        "price": float(item.get("price", {}).get("total", 0)),
+                        "currency": item.get("price", {}).get("currency", "EUR"),
+                    }
+                    for item in data.get("data", [])
+                ]
         except Exception as e:
             logger.warning(f"Amadeus price calendar failed: {e}")
         
@@ -2,16 +2,26 @@
 Base Flight Provider - Abstract interface for all flight search providers
 """
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import date
 from dataclasses import dataclass
 from enum import Enum
+import asyncio
 import logging
+import string
 
 from app.schemas.flight import FlightOffer
 
 logger = logging.getLogger(__name__)
 
+# ASCII-only upper-casing for IATA codes (no Unicode case mapping needed)
+_IATA_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+
+def normalize_iata_code(code: str) -> str:
+    """Upper-case an IATA code using the prebuilt ASCII table"""
+    return code.translate(_IATA_UPPER)
+
 
 class ProviderStatus(Enum):
     """Provider health status"""
@@ -20,7 +30,7 @@ class ProviderStatus(Enum):
     UNAVAILABLE = "unavailable"
 
 
-@dataclass
+@dataclass(slots=True)
 class ProviderResult:
     """Result from a provider search"""
     provider_name: str
@@ -48,6 +58,7 @@ class FlightProvider(ABC):
     
     # Current state
     _status: ProviderStatus = ProviderStatus.HEALTHY
+    _status_version: int = 0  # Bumped on every status change
     _consecutive_failures: int = 0
     _max_failures_before_degraded: int = 3
     _max_failures_before_unavailable: int = 10
@@ -61,6 +72,17 @@ class FlightProvider(ABC):
         """Get current provider status"""
         return self._status
     
+    @property
+    def status_version(self) -> int:
+        """Counter that changes whenever the status does (for cache invalidation)"""
+        return self._status_version
+    
+    def _set_status(self, status: ProviderStatus):
+        """Set the status, bumping status_version if it changed"""
+        if status is not self._status:
+            self._status = status
+            self._status_version += 1
+    
     @property
     def is_available(self) -> bool:
         """Check if provider is available for requests"""
@@ -74,7 +96,7 @@ class FlightProvider(ABC):
     def record_success(self):
         """Record a successful request"""
         self._consecutive_failures = 0
-        self._status = ProviderStatus.HEALTHY
+        self._set_status(ProviderStatus.HEALTHY)
     
     def record_failure(self, error: Exception):
         """Record a failed request"""
@@ -82,16 +104,16 @@ class FlightProvider(ABC):
         logger.warning(f"{self.name} provider failure #{self._consecutive_failures}: {error}")
         
         if self._consecutive_failures >= self._max_failures_before_unavailable:
-            self._status = ProviderStatus.UNAVAILABLE
+            self._set_status(ProviderStatus.UNAVAILABLE)
             logger.error(f"{self.name} provider marked as UNAVAILABLE after {self._consecutive_failures} failures")
         elif self._consecutive_failures >= self._max_failures_before_degraded:
-            self._status = ProviderStatus.DEGRADED
+            self._set_status(ProviderStatus.DEGRADED)
             logger.warning(f"{self.name} provider marked as DEGRADED after {self._consecutive_failures} failures")
     
     def reset_status(self):
         """Reset provider status (e.g., after manual recovery)"""
         self._consecutive_failures = 0
-        self._status = ProviderStatus.HEALTHY
+        self._set_status(ProviderStatus.HEALTHY)
     
     @abstractmethod
     async def search(
@@ -102,17 +124,20 @@ class FlightProvider(ABC):
         return_date: Optional[date] = None,
         passengers: int = 1,
         cabin_class: str = "economy",
+        direct_only: bool = False,
     ) -> List[FlightOffer]:
         """
         Search for flights.
         
         Args:
-            origin: Origin airport IATA code (e.g., "DUB")
-            destination: Destination airport IATA code (e.g., "BCN")
+            origin: Origin airport IATA code, already upper-cased by
+                ProviderManager/FlightService (e.g., "DUB")
+            destination: Destination airport IATA code, already upper-cased (e.g., "BCN")
             departure_date: Departure date
             return_date: Return date (optional for one-way)
             passengers: Number of passengers
             cabin_class: Cabin class (economy, premium_economy, business, first)
+            direct_only: Only return direct flights (filtered before offers are built)
         
         Returns:
             List of flight offers
@@ -137,6 +162,25 @@ class FlightProvider(ABC):
         """
         return []
     
+    async def get_price_calendar_range(
+        self,
+        origin: str,
+        destination: str,
+        months: List[Tuple[int, int]],
+    ) -> List[List[dict]]:
+        """
+        Get price calendars for several (year, month) pairs at once.
+        
+        The per-month requests run concurrently over the provider's HTTP
+        client instead of one after another. Results come back in the order
+        of months; a month that fails yields an empty list.
+        """
+        results = await asyncio.gather(
+            *[self.get_price_calendar(origin, destination, year, month) for year, month in months],
+            return_exceptions=True,
+        )
+        return [[] if isinstance(result, BaseException) else result for result in results]
+    
     async def health_check(self) -> bool:
         """
         Check if the provider is healthy and responsive.
@@ -145,6 +189,14 @@ class FlightProvider(ABC):
         Override for actual health checks.
         """
         return self.is_configured
+    
+    async def close(self):
+        """
+        Release any resources held by the provider (e.g., HTTP clients).
+        
+        Default implementation does nothing.
+        """
+        pass
 
 
 class ProviderError(Exception):
@@ -3,9 +3,11 @@ Kiwi.com Flight Provider - Multi-city and virtual interlining specialist
 https://docs.kiwi.com/
 """
 from typing import List, Optional
-from datetime import date, datetime
+from datetime import date, datetime, timezone
+from calendar import monthrange
 import httpx
 import logging
+import orjson
 
 from app.config import settings
 from app.schemas.flight import FlightOffer, FlightSegment
@@ -13,6 +15,16 @@ from .base import FlightProvider, ProviderError
 
 logger = logging.getLogger(__name__)
 
+_UTC = timezone.utc
+
+# Our cabin classes -> Kiwi selected_cabins codes
+_CABIN_MAP = {
+    "economy": "M",
+    "premium_economy": "W",
+    "business": "C",
+    "first": "F",
+}
+
 
 class KiwiProvider(FlightProvider):
     """
@@ -39,6 +51,30 @@ class KiwiProvider(FlightProvider):
         super().__init__()
         self._currency = "EUR"
         self._locale = "en"
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared HTTP client, creating it on first use.
+        
+        Reusing one client keeps TLS connections to Tequila alive between
+        requests and lets concurrent searches multiplex over HTTP/2. The API
+        key is sent as a default header so it isn't rebuilt per call.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                headers={"apikey": settings.KIWI_API_KEY or "", "Accept": "application/json"},
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     @property
     def is_configured(self) -> bool:
@@ -53,55 +89,44 @@ class KiwiProvider(FlightProvider):
         return_date: Optional[date] = None,
         passengers: int = 1,
         cabin_class: str = "economy",
+        direct_only: bool = False,
     ) -> List[FlightOffer]:
         """Search flights using Kiwi Tequila API"""
         if not self.is_configured:
             raise ProviderError(self.name, "Kiwi API key not configured")
         
         try:
-            cabin_map = {
-                "economy": "M",
-                "premium_economy": "W",
-                "business": "C",
-                "first": "F",
-            }
-            
-            headers = {
-                "apikey": settings.KIWI_API_KEY,
-                "Accept": "application/json",
-            }
-            
+            departure_str = departure_date.strftime("%d/%m/%Y")
             params = {
-                "fly_from": origin.upper(),
-                "fly_to": destination.upper(),
-                "date_from": departure_date.strftime("%d/%m/%Y"),
-                "date_to": departure_date.strftime("%d/%m/%Y"),
+                "fly_from": origin,
+                "fly_to": destination,
+                "date_from": departure_str,
+                "date_to": departure_str,
                 "adults": passengers,
                 "curr": self._currency,
                 "locale": self._locale,
-                "selected_cabins": cabin_map.get(cabin_class, "M"),
+                "selected_cabins": _CABIN_MAP.get(cabin_class, "M"),
                 "limit": 50,
                 "sort": "price",
             }
             
             if return_date:
-                params["return_from"] = return_date.strftime("%d/%m/%Y")
-                params["return_to"] = return_date.strftime("%d/%m/%Y")
+                params["return_from"] = params["return_to"] = return_date.strftime("%d/%m/%Y")
                 params["flight_type"] = "round"
             else:
                 params["flight_type"] = "oneway"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/search",
-                    headers=headers,
-                    params=params,
-                    timeout=30.0,
-                )
-                response.raise_for_status()
-                data = response.json()
+            if direct_only:
+                params["max_stopovers"] = 0
+            
+            response = await self._get_client().get(
+                f"{self.BASE_URL}/search",
+                params=params,
+            )
+            response.raise_for_status()
+            data = orjson.loads(response.content)
             
-            offers = self._parse_response(data, return_date is not None)
+            offers = self._parse_response(data, return_date is not None, direct_only)
             self.record_success()
             logger.info(f"Kiwi returned {len(offers)} offers for {origin}->{destination}")
             return offers
@@ -113,8 +138,15 @@ class KiwiProvider(FlightProvider):
             self.record_failure(e)
             raise ProviderError(self.name, str(e), e)
     
-    def _parse_response(self, data: dict, is_round_trip: bool) -> List[FlightOffer]:
-        """Parse Kiwi API response"""
+    def _parse_response(
+        self, data: dict, is_round_trip: bool, direct_only: bool = False
+    ) -> List[FlightOffer]:
+        """
+        Parse Kiwi API response.
+        
+        With direct_only, flights with more than one outbound segment are
+        skipped before any segment or offer models are built.
+        """
         offers = []
         
         for flight in data.get("data", []):
@@ -124,17 +156,22 @@ class KiwiProvider(FlightProvider):
                 # Parse all segments
                 route = flight.get("route", [])
                 
+                if direct_only:
+                    outbound_count = (
+                        sum(1 for seg in route if seg.get("return") == 0)
+                        if is_round_trip else len(route)
+                    )
+                    if outbound_count != 1:
+                        continue
+                
                 if is_round_trip:
-                    # Split segments into outbound and return
-                    outbound_segments = []
-                    return_segments = []
-                    
-                    for seg in route:
-                        parsed_seg = self._parse_segment(seg)
-                        if seg.get("return") == 0:
-                            outbound_segments.append(parsed_seg)
-                        else:
-                            return_segments.append(parsed_seg)
+                    # Split segments into outbound (return == 0) and return
+                    parsed = [
+                        (seg.get("return") == 0, self._parse_segment(seg))
+                        for seg in route
+                    ]
+                    outbound_segments = [p for is_outbound, p in parsed if is_outbound]
+                    return_segments = [p for is_outbound, p in parsed if not is_outbound]
                 else:
                     outbound_segments = [self._parse_segment(seg) for seg in route]
                     return_segments = None
@@ -151,7 +188,7 @@ class KiwiProvider(FlightProvider):
                     total_duration = duration_seconds // 60
                 
                 offers.append(FlightOffer(
-                    id=f"kiwi-{flight.get('id', '')}",
+                    id="kiwi-" + flight.get("id", ""),
                     price=price,
                     currency=self._currency,
                     cabin_class="economy",  # Kiwi doesn't always return cabin class
@@ -174,23 +211,32 @@ class KiwiProvider(FlightProvider):
         return offers
     
     def _parse_segment(self, seg: dict) -> FlightSegment:
-        """Parse a single flight segment"""
-        try:
-            departure_time = datetime.fromtimestamp(seg.get("dTimeUTC", 0))
-            arrival_time = datetime.fromtimestamp(seg.get("aTimeUTC", 0))
-        except:
-            departure_time = datetime.now()
-            arrival_time = datetime.now()
+        """
+        Parse a single flight segment.
+        
+        dTimeUTC/aTimeUTC are epoch seconds, so they're converted straight
+        to UTC datetimes rather than going through the local timezone.
+        """
+        get = seg.get
+        departure_ts = get("dTimeUTC", 0)
+        arrival_ts = get("aTimeUTC", 0)
+        airline = get("airline", "XX")
+        
+        if departure_ts and arrival_ts:
+            departure_time = datetime.fromtimestamp(departure_ts, _UTC)
+            arrival_time = datetime.fromtimestamp(arrival_ts, _UTC)
+        else:
+            departure_time = arrival_time = datetime.now(_UTC)
         
         return FlightSegment(
-            departure_airport=seg.get("flyFrom", "XXX"),
-            arrival_airport=seg.get("flyTo", "XXX"),
+            departure_airport=get("flyFrom", "XXX"),
+            arrival_airport=get("flyTo", "XXX"),
             departure_time=departure_time,
             arrival_time=arrival_time,
-            flight_number=f"{seg.get('airline', 'XX')}{seg.get('flight_no', '000')}",
-            airline=seg.get("airline", "XX"),
-            duration_minutes=(seg.get("aTimeUTC", 0) - seg.get("dTimeUTC", 0)) // 60,
-            aircraft=seg.get("equipment"),
+            flight_number=f"{airline}{get('flight_no', '000')}",
+            airline=airline,
+            duration_minutes=(arrival_ts - departure_ts) // 60,
+            aircraft=get("equipment"),
         )
     
     async def search_multi_city(
@@ -207,12 +253,6 @@ class KiwiProvider(FlightProvider):
             raise ProviderError(self.name, "Kiwi API key not configured")
         
         try:
-            headers = {
-                "apikey": settings.KIWI_API_KEY,
-                "Accept": "application/json",
-                "Content-Type": "application/json",
-            }
-            
             # Build multi-city request
             requests = []
             for route in routes:
@@ -230,15 +270,13 @@ class KiwiProvider(FlightProvider):
                 "limit": 30,
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.BASE_URL}/flights_multi",
-                    headers=headers,
-                    json=body,
-                    timeout=45.0,
-                )
-                response.raise_for_status()
-                data = response.json()
+            response = await self._get_client().post(
+                f"{self.BASE_URL}/flights_multi",
+                json=body,
+                timeout=45.0,
+            )
+            response.raise_for_status()
+            data = orjson.loads(response.content)
             
             return self._parse_response(data, False)
             
@@ -265,14 +303,9 @@ class KiwiProvider(FlightProvider):
             raise ProviderError(self.name, "Kiwi API key not configured")
         
         try:
-            headers = {
-                "apikey": settings.KIWI_API_KEY,
-                "Accept": "application/json",
-            }
-            
             params = {
-                "fly_from": origin.upper(),
-                "fly_to": destination.upper(),
+                "fly_from": origin,
+                "fly_to": destination,
                 "date_from": date_from.strftime("%d/%m/%Y"),
                 "date_to": date_to.strftime("%d/%m/%Y"),
                 "nights_in_dst_from": nights_from,
@@ -284,15 +317,12 @@ class KiwiProvider(FlightProvider):
                 "flight_type": "round",
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/search",
-                    headers=headers,
-                    params=params,
-                    timeout=30.0,
-                )
-                response.raise_for_status()
-                data = response.json()
+            response = await self._get_client().get(
+                f"{self.BASE_URL}/search",
+                params=params,
+            )
+            response.raise_for_status()
+            data = orjson.loads(response.content)
             
             return self._parse_response(data, True)
             
@@ -312,16 +342,11 @@ class KiwiProvider(FlightProvider):
             return []
         
         try:
-            from calendar import monthrange
             _, num_days = monthrange(year, month)
             
-            headers = {
-                "apikey": settings.KIWI_API_KEY,
-            }
-            
             params = {
-                "fly_from": origin.upper(),
-                "fly_to": destination.upper(),
+                "fly_from": origin,
+                "fly_to": destination,
                 "date_from": f"01/{month:02d}/{year}",
                 "date_to": f"{num_days}/{month:02d}/{year}",
                 "one_for_city": 0,
@@ -330,30 +355,28 @@ class KiwiProvider(FlightProvider):
                 "sort": "price",
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/search",
-                    headers=headers,
-                    params=params,
-                    timeout=30.0,
-                )
+            response = await self._get_client().get(
+                f"{self.BASE_URL}/search",
+                params=params,
+            )
+            
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
                 
-                if response.status_code == 200:
-                    data = response.json()
+                # Group by date and find cheapest
+                prices_by_date = {}
+                for flight in data.get("data", []):
+                    dep_date = date.fromtimestamp(flight["dTimeUTC"]).isoformat()
+                    price = flight.get("price", 0)
                     
-                    # Group by date and find cheapest
-                    prices_by_date = {}
-                    for flight in data.get("data", []):
-                        dep_date = datetime.fromtimestamp(flight["dTimeUTC"]).date().isoformat()
-                        price = flight.get("price", 0)
-                        
-                        if dep_date not in prices_by_date or price < prices_by_date[dep_date]:
-                            prices_by_date[dep_date] = price
-                    
-                    return [
-                        {"date": d, "price": p, "currency": self._currency}
-                        for d, p in sorted(prices_by_date.items())
-                    ]
+                    current = prices_by_date.get(dep_date)
+                    if current is None or price < current:
+                        prices_by_date[dep_date] = price
+                
+                return [
+                    {"date": d, "price": p, "currency": self._currency}
+                    for d, p in sorted(prices_by_date.items())
+                ]
         except Exception as e:
             logger.warning(f"Kiwi price calendar failed: {e}")
         
@@ -365,15 +388,11 @@ class KiwiProvider(FlightProvider):
             return False
         
         try:
-            headers = {"apikey": settings.KIWI_API_KEY}
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/locations/query",
-                    headers=headers,
-                    params={"term": "DUB"},
-                    timeout=10.0,
-                )
-                return response.status_code == 200
+            response = await self._get_client().get(
+                f"{self.BASE_URL}/locations/query",
+                params={"term": "DUB"},
+                timeout=10.0,
+            )
+            return response.status_code == 200
         except Exception:
             return False
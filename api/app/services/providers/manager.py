@@ -1,20 +1,25 @@
 """
 Provider Manager - Orchestrates multiple flight search providers with failover
 """
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Sequence, Tuple
 from datetime import date
+from operator import attrgetter
 import asyncio
 import logging
-from collections import defaultdict
+import time
 
 from app.schemas.flight import FlightOffer
-from .base import FlightProvider, ProviderResult, ProviderStatus, ProviderError
+from .base import FlightProvider, ProviderResult, ProviderStatus, ProviderError, normalize_iata_code
 from .amadeus import AmadeusProvider
 from .skyscanner import SkyscannerProvider
 from .kiwi import KiwiProvider
+from .reliability import CircuitBreaker, Bulkhead
 
 logger = logging.getLogger(__name__)
 
+# Sort key for offers (C-level getter instead of a per-element lambda call)
+_BY_PRICE = attrgetter("price")
+
 
 class ProviderManager:
     """
@@ -23,8 +28,18 @@ class ProviderManager:
     - Automatic failover
     - Result aggregation and deduplication
     - Provider health tracking
+    - Per-provider circuit breakers and bulkheads for parallel searches
     """
     
+    # Overall deadline (seconds) for a parallel search across providers
+    PARALLEL_SEARCH_BUDGET = 30.0
+    # best_price stops waiting once this many providers have succeeded
+    BEST_PRICE_MIN_SUCCESSES = 2
+    # Weight of the newest sample in the response time moving average
+    STATS_EMA_ALPHA = 0.1
+    # Per-provider cap (seconds) on a health check
+    HEALTH_CHECK_TIMEOUT = 5.0
+    
     def __init__(self):
         # Initialize all providers
         self._providers: List[FlightProvider] = [
@@ -34,15 +49,33 @@ class ProviderManager:
         ]
         
         # Sort by priority (lower = higher priority)
-        self._providers.sort(key=lambda p: p.priority)
-        
-        # Track provider stats
-        self._search_stats: Dict[str, Dict] = defaultdict(lambda: {
-            "total_searches": 0,
-            "successful_searches": 0,
-            "total_results": 0,
-            "avg_response_time_ms": 0,
-        })
+        self._providers.sort(key=attrgetter("priority"))
+        
+        # available_providers cache, keyed by the summed status versions
+        self._available_cache: Optional[Tuple[FlightProvider, ...]] = None
+        self._available_version = 0
+        
+        # In-flight searches keyed by their arguments, for request coalescing
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        
+        # Reliability guards keyed by provider name
+        self._breakers: Dict[str, CircuitBreaker] = {
+            p.name: CircuitBreaker(p.name) for p in self._providers
+        }
+        self._bulkheads: Dict[str, Bulkhead] = {
+            p.name: Bulkhead() for p in self._providers
+        }
+        
+        # Track provider stats (one pre-built slot per provider)
+        self._search_stats: Dict[str, Dict] = {
+            p.name: {
+                "total_searches": 0,
+                "successful_searches": 0,
+                "total_results": 0,
+                "avg_response_time_ms": 0.0,
+            }
+            for p in self._providers
+        }
     
     @property
     def providers(self) -> List[FlightProvider]:
@@ -50,12 +83,21 @@ class ProviderManager:
         return self._providers
     
     @property
-    def available_providers(self) -> List[FlightProvider]:
-        """Get providers that are configured and available"""
-        return [
-            p for p in self._providers 
-            if p.is_configured and p.is_available
-        ]
+    def available_providers(self) -> Tuple[FlightProvider, ...]:
+        """
+        Get providers that are configured and available.
+        
+        The filtered tuple is cached and only rebuilt after some provider's
+        status has changed (tracked through the providers' status_version).
+        """
+        version = sum(p.status_version for p in self._providers)
+        if self._available_cache is None or version != self._available_version:
+            self._available_cache = tuple(
+                p for p in self._providers
+                if p.is_configured and p.is_available
+            )
+            self._available_version = version
+        return self._available_cache
     
     def get_provider(self, name: str) -> Optional[FlightProvider]:
         """Get a specific provider by name"""
@@ -72,6 +114,7 @@ class ProviderManager:
         return_date: Optional[date] = None,
         passengers: int = 1,
         cabin_class: str = "economy",
+        direct_only: bool = False,
         strategy: str = "fallback",  # "fallback", "parallel", "best_price"
         max_providers: int = 3,
     ) -> List[FlightOffer]:
@@ -90,13 +133,55 @@ class ProviderManager:
             return_date: Return date (optional)
             passengers: Number of passengers
             cabin_class: Cabin class preference
+            direct_only: Only return direct flights
             strategy: Search strategy
             max_providers: Maximum providers to use
         
         Returns:
             List of flight offers, sorted by price
+        
+        Concurrent calls with identical arguments share one underlying
+        search instead of each fanning out to the providers.
         """
-        available = self.available_providers[:max_providers]
+        # Normalize once here: providers expect upper-case IATA codes, and
+        # the coalescing key must not depend on how the caller cased them
+        origin = normalize_iata_code(origin)
+        destination = normalize_iata_code(destination)
+        
+        key = (
+            origin, destination, departure_date, return_date, passengers,
+            cabin_class, direct_only, strategy, max_providers,
+        )
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(self._search(
+                origin, destination, departure_date, return_date, passengers,
+                cabin_class, direct_only, strategy, max_providers,
+            ))
+            self._inflight[key] = task
+            task.add_done_callback(
+                lambda done: self._inflight.pop(key) if self._inflight.get(key) is done else None
+            )
+        
+        # Shielded so one caller going away doesn't cancel the others' search
+        return list(await asyncio.shield(task))
+    
+    async def _search(
+        self,
+        origin: str,
+        destination: str,
+        departure_date: date,
+        return_date: Optional[date],
+        passengers: int,
+        cabin_class: str,
+        direct_only: bool,
+        strategy: str,
+        max_providers: int,
+    ) -> List[FlightOffer]:
+        """Run a search with the given strategy (see search)"""
+        available = self.available_providers
+        if len(available) > max_providers:
+            available = available[:max_providers]
         
         if not available:
             logger.warning("No flight providers available")
@@ -105,33 +190,34 @@ class ProviderManager:
         if strategy == "fallback":
             return await self._search_with_fallback(
                 available, origin, destination, departure_date, 
-                return_date, passengers, cabin_class
+                return_date, passengers, cabin_class, direct_only
             )
         elif strategy == "parallel":
             return await self._search_parallel(
                 available, origin, destination, departure_date,
-                return_date, passengers, cabin_class
+                return_date, passengers, cabin_class, direct_only
             )
         elif strategy == "best_price":
             return await self._search_best_price(
                 available, origin, destination, departure_date,
-                return_date, passengers, cabin_class
+                return_date, passengers, cabin_class, direct_only
             )
         else:
             return await self._search_with_fallback(
                 available, origin, destination, departure_date,
-                return_date, passengers, cabin_class
+                return_date, passengers, cabin_class, direct_only
             )
     
     async def _search_with_fallback(
         self,
-        providers: List[FlightProvider],
+        providers: Sequence[FlightProvider],
         origin: str,
         destination: str,
         departure_date: date,
         return_date: Optional[date],
         passengers: int,
         cabin_class: str,
+        direct_only: bool,
     ) -> List[FlightOffer]:
         """
         Search providers in priority order with automatic failover.
@@ -144,20 +230,19 @@ class ProviderManager:
             try:
                 logger.info(f"Searching with {provider.name} provider")
                 
-                import time
-                start = time.time()
+                start = time.monotonic()
                 
                 offers = await provider.search(
                     origin, destination, departure_date,
-                    return_date, passengers, cabin_class
+                    return_date, passengers, cabin_class, direct_only
                 )
                 
-                response_time = (time.time() - start) * 1000
+                response_time = (time.monotonic() - start) * 1000
                 self._update_stats(provider.name, True, len(offers), response_time)
                 
                 if offers:
                     logger.info(f"{provider.name} returned {len(offers)} offers in {response_time:.0f}ms")
-                    return sorted(offers, key=lambda x: x.price)
+                    return sorted(offers, key=_BY_PRICE)
                     
             except ProviderError as e:
                 last_error = e
@@ -175,29 +260,50 @@ class ProviderManager:
     
     async def _search_parallel(
         self,
-        providers: List[FlightProvider],
+        providers: Sequence[FlightProvider],
         origin: str,
         destination: str,
         departure_date: date,
         return_date: Optional[date],
         passengers: int,
         cabin_class: str,
+        direct_only: bool,
+        min_successes: Optional[int] = None,
+        prefer_cheapest: bool = False,
     ) -> List[FlightOffer]:
         """
         Search all providers simultaneously and aggregate results.
         
-        Useful when you want the widest selection of flights.
+        Useful when you want the widest selection of flights. Providers
+        whose circuit is open are skipped without a network call, and each
+        provider's bulkhead caps its concurrent in-flight searches.
+        
+        All searches share one PARALLEL_SEARCH_BUDGET deadline; providers
+        still running when it passes are cancelled and count as failures.
+        With min_successes, the remaining searches are cancelled as soon as
+        that many providers have succeeded. Duplicates keep the first
+        (highest priority) offer, or the cheapest with prefer_cheapest.
         """
         async def search_provider(provider: FlightProvider) -> ProviderResult:
-            import time
-            start = time.time()
+            breaker = self._breakers[provider.name]
+            if not breaker.allow_request():
+                return ProviderResult(
+                    provider_name=provider.name,
+                    offers=[],
+                    success=False,
+                    error_message="circuit open",
+                )
+            
+            start = time.monotonic()
             
             try:
-                offers = await provider.search(
-                    origin, destination, departure_date,
-                    return_date, passengers, cabin_class
-                )
-                response_time = (time.time() - start) * 1000
+                async with self._bulkheads[provider.name]:
+                    offers = await provider.search(
+                        origin, destination, departure_date,
+                        return_date, passengers, cabin_class, direct_only
+                    )
+                response_time = (time.monotonic() - start) * 1000
+                breaker.record_success()
                 self._update_stats(provider.name, True, len(offers), response_time)
                 
                 return ProviderResult(
@@ -207,6 +313,7 @@ class ProviderManager:
                     response_time_ms=response_time,
                 )
             except Exception as e:
+                breaker.record_failure()
                 self._update_stats(provider.name, False, 0, 0)
                 return ProviderResult(
                     provider_name=provider.name,
@@ -215,84 +322,118 @@ class ProviderManager:
                     error_message=str(e),
                 )
         
-        # Run all searches in parallel
-        results = await asyncio.gather(
-            *[search_provider(p) for p in providers],
-            return_exceptions=True
-        )
+        # Run all searches in parallel under a single deadline
+        tasks = [asyncio.create_task(search_provider(p)) for p in providers]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.PARALLEL_SEARCH_BUDGET
+        return_when = asyncio.FIRST_COMPLETED if min_successes else asyncio.ALL_COMPLETED
+        pending = set(tasks)
+        successes = 0
+        
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=return_when)
+                successes += sum(1 for task in done if task.result().success)
+                if min_successes and successes >= min_successes:
+                    break
+        except asyncio.CancelledError:
+            # Caller went away; don't leave provider searches running
+            for task in tasks:
+                task.cancel()
+            raise
         
-        # Aggregate offers from all successful providers
+        timed_out = bool(pending) and loop.time() >= deadline
+        if pending:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        # Aggregate offers from all successful providers, in priority order
         all_offers = []
-        for result in results:
-            if isinstance(result, ProviderResult) and result.success:
+        for provider, task in zip(providers, tasks):
+            if task.cancelled():
+                if timed_out:
+                    logger.warning(f"{provider.name} missed the parallel search deadline")
+                    self._breakers[provider.name].record_failure()
+                    self._update_stats(provider.name, False, 0, 0)
+                else:
+                    # Cut short by min_successes, not the provider's fault
+                    self._breakers[provider.name].release_trial()
+                continue
+            
+            result = task.result()
+            if result.success:
                 all_offers.extend(result.offers)
                 logger.info(f"{result.provider_name}: {len(result.offers)} offers")
         
         # Deduplicate and sort
-        unique_offers = self._deduplicate_offers(all_offers)
-        return sorted(unique_offers, key=lambda x: x.price)
+        return self._deduplicate_offers(all_offers, prefer_cheapest)
     
     async def _search_best_price(
         self,
-        providers: List[FlightProvider],
+        providers: Sequence[FlightProvider],
         origin: str,
         destination: str,
         departure_date: date,
         return_date: Optional[date],
         passengers: int,
         cabin_class: str,
+        direct_only: bool,
     ) -> List[FlightOffer]:
         """
         Search all providers and return deduplicated results with best prices.
         
         For flights that appear in multiple providers, keep only the cheapest.
+        Once two providers have answered, slower ones are not waited for.
         """
-        all_offers = await self._search_parallel(
+        return await self._search_parallel(
             providers, origin, destination, departure_date,
-            return_date, passengers, cabin_class
+            return_date, passengers, cabin_class, direct_only,
+            min_successes=self.BEST_PRICE_MIN_SUCCESSES,
+            prefer_cheapest=True,
         )
-        
-        # Group by flight signature (airline + times) and keep cheapest
-        best_offers: Dict[str, FlightOffer] = {}
-        
-        for offer in all_offers:
-            signature = self._get_flight_signature(offer)
-            
-            if signature not in best_offers or offer.price < best_offers[signature].price:
-                best_offers[signature] = offer
-        
-        return sorted(best_offers.values(), key=lambda x: x.price)
     
-    def _deduplicate_offers(self, offers: List[FlightOffer]) -> List[FlightOffer]:
-        """Remove duplicate offers based on flight signature"""
-        seen = set()
-        unique = []
+    def _deduplicate_offers(
+        self, offers: List[FlightOffer], prefer_cheapest: bool = False
+    ) -> List[FlightOffer]:
+        """
+        Remove duplicate offers based on flight signature, sorted by price.
+        
+        One pass over a dict keyed by signature: the first offer seen wins,
+        or with prefer_cheapest the lowest-priced one.
+        """
+        unique: Dict[Tuple, FlightOffer] = {}
         
         for offer in offers:
             signature = self._get_flight_signature(offer)
-            if signature not in seen:
-                seen.add(signature)
-                unique.append(offer)
+            current = unique.get(signature)
+            if current is None or (prefer_cheapest and offer.price < current.price):
+                unique[signature] = offer
         
-        return unique
+        return sorted(unique.values(), key=_BY_PRICE)
     
-    def _get_flight_signature(self, offer: FlightOffer) -> str:
+    def _get_flight_signature(self, offer: FlightOffer) -> Tuple:
         """
         Generate a unique signature for a flight based on:
         - Airline
         - Flight numbers
-        - Departure/arrival times
-        """
-        parts = [offer.airline]
-        
-        for seg in offer.outbound_segments:
-            parts.append(f"{seg.flight_number}-{seg.departure_time.isoformat()}")
+        - Departure times (epoch seconds)
         
-        if offer.return_segments:
-            for seg in offer.return_segments:
-                parts.append(f"{seg.flight_number}-{seg.departure_time.isoformat()}")
-        
-        return "|".join(parts)
+        The signature is a tuple of strings and ints, computed once per offer
+        and memoized on it, since dedup and best-price grouping both need it.
+        """
+        signature = offer._signature
+        if signature is None:
+            signature = (
+                offer.airline,
+                tuple((seg.flight_number, int(seg.departure_time.timestamp())) for seg in offer.outbound_segments),
+                tuple((seg.flight_number, int(seg.departure_time.timestamp())) for seg in offer.return_segments or ()),
+            )
+            offer._signature = signature
+        return signature
     
     def _update_stats(
         self, 
@@ -301,7 +442,12 @@ class ProviderManager:
         result_count: int, 
         response_time_ms: float
     ):
-        """Update provider statistics"""
+        """
+        Update provider statistics.
+        
+        avg_response_time_ms is an exponential moving average, so it
+        follows a provider's recent latency rather than its lifetime mean.
+        """
         stats = self._search_stats[provider_name]
         stats["total_searches"] += 1
         
@@ -309,10 +455,10 @@ class ProviderManager:
             stats["successful_searches"] += 1
             stats["total_results"] += result_count
             
-            # Rolling average response time
-            n = stats["successful_searches"]
-            old_avg = stats["avg_response_time_ms"]
-            stats["avg_response_time_ms"] = old_avg + (response_time_ms - old_avg) / n
+            avg = stats["avg_response_time_ms"]
+            stats["avg_response_time_ms"] = (
+                avg + self.STATS_EMA_ALPHA * (response_time_ms - avg) if avg else response_time_ms
+            )
     
     def get_provider_stats(self) -> Dict[str, Dict]:
         """Get statistics for all providers"""
@@ -348,6 +494,9 @@ class ProviderManager:
         
         Tries providers in order until one returns data.
         """
+        origin = normalize_iata_code(origin)
+        destination = normalize_iata_code(destination)
+        
         for provider in self.available_providers:
             try:
                 prices = await provider.get_price_calendar(origin, destination, year, month)
@@ -360,16 +509,25 @@ class ProviderManager:
         return []
     
     async def health_check(self) -> Dict[str, bool]:
-        """Check health of all providers"""
-        results = {}
+        """
+        Check health of all providers (concurrently).
         
-        for provider in self._providers:
-            try:
-                results[provider.name] = await provider.health_check()
-            except Exception:
-                results[provider.name] = False
+        Each check is capped at HEALTH_CHECK_TIMEOUT seconds, so a degraded
+        provider retrying its auth can't hold up the status endpoint; a
+        check that times out or raises reports False.
+        """
+        checks = await asyncio.gather(
+            *[
+                asyncio.wait_for(provider.health_check(), timeout=self.HEALTH_CHECK_TIMEOUT)
+                for provider in self._providers
+            ],
+            return_exceptions=True,
+        )
         
-        return results
+        return {
+            provider.name: check is True
+            for provider, check in zip(self._providers, checks)
+        }
     
     def reset_provider(self, provider_name: str):
         """Reset a provider's status (e.g., after fixing an issue)"""
@@ -377,6 +535,14 @@ class ProviderManager:
         if provider:
             provider.reset_status()
             logger.info(f"Reset {provider_name} provider status")
+    
+    async def close(self):
+        """Release provider resources (called on application shutdown)"""
+        for provider in self._providers:
+            try:
+                await provider.close()
+            except Exception as e:
+                logger.warning(f"Failed to close {provider.name} provider: {e}")
 
 
 # Singleton instance for the application
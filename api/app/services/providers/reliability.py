@@ -0,0 +1,112 @@
+"""
+Provider Reliability - Circuit breaker and bulkhead guards for provider calls
+"""
+from typing import Optional
+from enum import Enum
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """Circuit breaker state"""
+    CLOSED = "closed"        # Calls go through
+    OPEN = "open"            # Calls are skipped until the recovery timeout
+    HALF_OPEN = "half_open"  # One trial call decides whether to close again
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+    
+    After error_threshold consecutive failures the circuit opens and calls
+    are skipped without touching the network. Once recovery_timeout seconds
+    have passed a single trial call is let through: success closes the
+    circuit, failure opens it for another recovery period.
+    """
+    
+    def __init__(self, name: str, error_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.error_threshold = error_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+    
+    @property
+    def state(self) -> CircuitState:
+        """Current state (an open circuit turns half-open after the recovery timeout)"""
+        if (
+            self._state is CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """Check whether a call may go through, claiming the trial slot when half-open"""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+    
+    def record_success(self):
+        """Record a successful call"""
+        if self._state is not CircuitState.CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+    
+    def release_trial(self):
+        """Free the half-open trial slot when a call was abandoned without an outcome"""
+        self._trial_in_flight = False
+    
+    def record_failure(self):
+        """Record a failed call"""
+        self._failures += 1
+        if self._state is CircuitState.HALF_OPEN or self._failures >= self.error_threshold:
+            if self._state is not CircuitState.OPEN:
+                logger.warning(f"{self.name} circuit opened after {self._failures} failures")
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class Bulkhead:
+    """
+    Per-provider cap on concurrent in-flight calls.
+    
+    Usage:
+        async with bulkhead:
+            await provider.search(...)
+    
+    The semaphore is created lazily for the running event loop, since
+    Celery tasks each run their own loop.
+    """
+    
+    def __init__(self, max_concurrent: int = 8):
+        self.max_concurrent = max_concurrent
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._loop = loop
+        return self._semaphore
+    
+    async def __aenter__(self) -> "Bulkhead":
+        await self._get_semaphore().acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
@@ -2,10 +2,13 @@
 Skyscanner Flight Provider - Price comparison meta-search
 https://developers.skyscanner.net/
 """
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import date, datetime
+import asyncio
 import httpx
 import logging
+import orjson
+import random
 
 from app.config import settings
 from app.schemas.flight import FlightOffer, FlightSegment
@@ -13,6 +16,24 @@ from .base import FlightProvider, ProviderError
 
 logger = logging.getLogger(__name__)
 
+try:
+    # C parser, much faster than fromisoformat for every segment timestamp
+    from ciso8601 import parse_datetime as _parse_datetime
+except ImportError:
+    # fromisoformat accepts a trailing "Z" natively (Python 3.11+)
+    _parse_datetime = datetime.fromisoformat
+
+# Shared read-only default for missing legs/segments (avoids a new {} per miss)
+_EMPTY: dict = {}
+
+# Our cabin classes -> Skyscanner cabinClass values
+_CABIN_MAP = {
+    "economy": "economy",
+    "premium_economy": "premiumeconomy",
+    "business": "business",
+    "first": "first",
+}
+
 
 class SkyscannerProvider(FlightProvider):
     """
@@ -33,11 +54,47 @@ class SkyscannerProvider(FlightProvider):
     RAPIDAPI_HOST = "skyscanner-skyscanner-flight-search-v1.p.rapidapi.com"
     BASE_URL = f"https://{RAPIDAPI_HOST}/apiservices"
     
+    # Result polling: exponential backoff (seconds) under one overall deadline
+    POLL_BUDGET = 20.0
+    POLL_BASE_DELAY = 0.2
+    POLL_MAX_DELAY = 2.0
+    
+    # Responses with fewer places than this are indexed in full
+    FULL_INDEX_MAX_PLACES = 200
+    
     def __init__(self):
         super().__init__()
         self._market = "IE"  # Default market
         self._currency = "EUR"
         self._locale = "en-US"
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared HTTP client, creating it on first use.
+        
+        Reusing one client keeps TLS connections to RapidAPI alive, so the
+        session create call and every poll share a connection instead of
+        each doing its own handshake. The RapidAPI headers are sent as
+        defaults so they aren't rebuilt per call.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                headers={
+                    "X-RapidAPI-Key": getattr(settings, "SKYSCANNER_API_KEY", None) or "",
+                    "X-RapidAPI-Host": self.RAPIDAPI_HOST,
+                },
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     @property
     def is_configured(self) -> bool:
@@ -52,6 +109,7 @@ class SkyscannerProvider(FlightProvider):
         return_date: Optional[date] = None,
         passengers: int = 1,
         cabin_class: str = "economy",
+        direct_only: bool = False,
     ) -> List[FlightOffer]:
         """Search flights using Skyscanner API"""
         if not self.is_configured:
@@ -64,7 +122,7 @@ class SkyscannerProvider(FlightProvider):
             )
             
             # Step 2: Poll results
-            offers = await self._poll_results(session_key)
+            offers = await self._poll_results(session_key, direct_only=direct_only)
             
             self.record_success()
             logger.info(f"Skyscanner returned {len(offers)} offers for {origin}->{destination}")
@@ -87,19 +145,6 @@ class SkyscannerProvider(FlightProvider):
         cabin_class: str,
     ) -> str:
         """Create a pricing session and return session key"""
-        cabin_map = {
-            "economy": "economy",
-            "premium_economy": "premiumeconomy",
-            "business": "business",
-            "first": "first",
-        }
-        
-        headers = {
-            "X-RapidAPI-Key": settings.SKYSCANNER_API_KEY,
-            "X-RapidAPI-Host": self.RAPIDAPI_HOST,
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
-        
         data = {
             "country": self._market,
             "currency": self._currency,
@@ -108,104 +153,121 @@ class SkyscannerProvider(FlightProvider):
             "destinationPlace": f"{destination}-sky",
             "outboundDate": departure_date.isoformat(),
             "adults": passengers,
-            "cabinClass": cabin_map.get(cabin_class, "economy"),
+            "cabinClass": _CABIN_MAP.get(cabin_class, "economy"),
         }
         
         if return_date:
             data["inboundDate"] = return_date.isoformat()
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.BASE_URL}/pricing/v1.0",
-                headers=headers,
-                data=data,
-                timeout=30.0,
-            )
-            
-            # Session created - key is in Location header
-            if response.status_code == 201:
-                location = response.headers.get("Location", "")
-                return location.split("/")[-1] if location else ""
-            
+        # Form data is sent as application/x-www-form-urlencoded
+        response = await self._get_client().post(
+            f"{self.BASE_URL}/pricing/v1.0",
+            data=data,
+        )
+        
+        # Session created - key is in Location header
+        if response.status_code == 201:
+            session_key = response.headers.get("Location", "").rstrip("/").split("/")[-1]
+            if session_key:
+                return session_key
+            message = "Skyscanner session created without a Location header"
+        else:
             response.raise_for_status()
-            return ""
+            message = f"Unexpected status {response.status_code} creating Skyscanner session"
+        
+        # No usable session; fail the search (and count it against the
+        # provider) rather than polling nothing and reporting zero offers
+        raise httpx.HTTPStatusError(message, request=response.request, response=response)
     
-    async def _poll_results(self, session_key: str, max_attempts: int = 5) -> List[FlightOffer]:
-        """Poll session for results"""
+    async def _poll_results(
+        self, session_key: str, max_attempts: int = 10, direct_only: bool = False
+    ) -> List[FlightOffer]:
+        """
+        Poll session for results.
+        
+        Polls back off exponentially with jitter (fast sessions are picked up
+        within a few hundred ms) and the whole loop shares one deadline of
+        POLL_BUDGET seconds. Only still-updating sessions, 429s, 5xx and
+        timeouts are retried; any other status ends polling.
+        """
         if not session_key:
             return []
         
-        headers = {
-            "X-RapidAPI-Key": settings.SKYSCANNER_API_KEY,
-            "X-RapidAPI-Host": self.RAPIDAPI_HOST,
-        }
-        
-        import asyncio
+        client = self._get_client()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.POLL_BUDGET
         
         for attempt in range(max_attempts):
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/pricing/uk2/v1.0/{session_key}",
-                    headers=headers,
-                    params={"sortType": "price", "sortOrder": "asc", "pageIndex": 0, "pageSize": 50},
-                    timeout=30.0,
-                )
-                
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            
+            try:
+                async with asyncio.timeout(remaining):
+                    response = await client.get(
+                        f"{self.BASE_URL}/pricing/uk2/v1.0/{session_key}",
+                        params={"sortType": "price", "sortOrder": "asc", "pageIndex": 0, "pageSize": 50},
+                    )
+            except (TimeoutError, httpx.TimeoutException):
+                logger.debug(f"Skyscanner poll {attempt + 1} timed out")
+            else:
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     
                     # Check if search is complete
                     if data.get("Status") == "UpdatesComplete":
-                        return self._parse_response(data)
-                    
-                    # Still updating, wait and retry
-                    await asyncio.sleep(1)
-                else:
+                        return self._parse_response(data, direct_only)
+                elif response.status_code != 429 and response.status_code < 500:
                     break
+            
+            # Still updating (or transient failure), back off and retry
+            delay = min(self.POLL_BASE_DELAY * 2 ** attempt, self.POLL_MAX_DELAY)
+            delay *= random.uniform(0.5, 1.0)
+            await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
         
         return []
     
-    def _parse_response(self, data: dict) -> List[FlightOffer]:
-        """Parse Skyscanner API response"""
-        offers = []
+    def _parse_response(self, data: dict, direct_only: bool = False) -> List[FlightOffer]:
+        """
+        Parse Skyscanner API response.
         
-        # Build lookup dictionaries
-        legs = {leg["Id"]: leg for leg in data.get("Legs", [])}
-        segments = {seg["Id"]: seg for seg in data.get("Segments", [])}
-        carriers = {c["Id"]: c for c in data.get("Carriers", [])}
-        places = {p["Id"]: p for p in data.get("Places", [])}
+        With direct_only, itineraries whose outbound leg has more than one
+        segment are skipped before any segment or offer models are built.
+        """
+        offers = []
+        itineraries = data.get("Itineraries", [])[:50]
+        legs, segments, carrier_codes, place_codes = self._build_lookups(data, itineraries)
         
-        for itinerary in data.get("Itineraries", [])[:50]:
+        for itinerary in itineraries:
             try:
                 pricing = itinerary.get("PricingOptions", [{}])[0]
                 price = pricing.get("Price", 0)
                 
-                outbound_leg_id = itinerary.get("OutboundLegId")
-                outbound_leg = legs.get(outbound_leg_id, {})
+                outbound_leg = legs.get(itinerary.get("OutboundLegId"), _EMPTY)
+                
+                if direct_only and len(outbound_leg.get("SegmentIds", ())) != 1:
+                    continue
                 
                 # Parse outbound segments
                 outbound_segments = self._parse_leg_segments(
-                    outbound_leg, segments, carriers, places
+                    outbound_leg, segments, carrier_codes, place_codes
                 )
+                duration = outbound_leg.get("Duration", 0)
                 
                 # Parse inbound if round trip
                 return_segments = None
                 inbound_leg_id = itinerary.get("InboundLegId")
                 if inbound_leg_id:
-                    inbound_leg = legs.get(inbound_leg_id, {})
+                    inbound_leg = legs.get(inbound_leg_id, _EMPTY)
                     return_segments = self._parse_leg_segments(
-                        inbound_leg, segments, carriers, places
+                        inbound_leg, segments, carrier_codes, place_codes
                     )
-                
-                # Calculate duration
-                duration = outbound_leg.get("Duration", 0)
-                if return_segments:
-                    inbound_leg = legs.get(inbound_leg_id, {})
-                    duration += inbound_leg.get("Duration", 0)
+                    if return_segments:
+                        duration += inbound_leg.get("Duration", 0)
                 
                 # Get carrier info
-                carrier_ids = outbound_leg.get("Carriers", [])
-                airline = carriers.get(carrier_ids[0], {}).get("Code", "XX") if carrier_ids else "XX"
+                carrier_ids = outbound_leg.get("Carriers")
+                airline = carrier_codes.get(carrier_ids[0], "XX") if carrier_ids else "XX"
                 
                 offers.append(FlightOffer(
                     id=f"skyscanner-{itinerary.get('Id', '')}",
@@ -227,45 +289,82 @@ class SkyscannerProvider(FlightProvider):
         
         return offers
     
+    def _build_lookups(self, data: dict, itineraries: list) -> Tuple[dict, dict, dict, dict]:
+        """
+        Build the leg, segment, carrier-code and place-code lookups.
+        
+        Small responses are indexed in full. Large ones (thousands of
+        places) only index what the parsed itineraries reference: their
+        legs, then those legs' segments, then the carriers and places used.
+        """
+        if len(data.get("Places", ())) < self.FULL_INDEX_MAX_PLACES:
+            return (
+                {leg["Id"]: leg for leg in data.get("Legs", ())},
+                {seg["Id"]: seg for seg in data.get("Segments", ())},
+                {c["Id"]: c.get("Code", "XX") for c in data.get("Carriers", ())},
+                {p["Id"]: p.get("Code", "XXX") for p in data.get("Places", ())},
+            )
+        
+        leg_ids = set()
+        for itinerary in itineraries:
+            leg_ids.add(itinerary.get("OutboundLegId"))
+            leg_ids.add(itinerary.get("InboundLegId"))
+        legs = {leg["Id"]: leg for leg in data.get("Legs", ()) if leg["Id"] in leg_ids}
+        
+        segment_ids = set()
+        carrier_ids = set()
+        for leg in legs.values():
+            segment_ids.update(leg.get("SegmentIds", ()))
+            carrier_ids.update(leg.get("Carriers", ()))
+        segments = {seg["Id"]: seg for seg in data.get("Segments", ()) if seg["Id"] in segment_ids}
+        
+        place_ids = set()
+        for seg in segments.values():
+            carrier_ids.add(seg.get("Carrier"))
+            place_ids.add(seg.get("OriginStation"))
+            place_ids.add(seg.get("DestinationStation"))
+        
+        carrier_codes = {
+            c["Id"]: c.get("Code", "XX") for c in data.get("Carriers", ()) if c["Id"] in carrier_ids
+        }
+        place_codes = {
+            p["Id"]: p.get("Code", "XXX") for p in data.get("Places", ()) if p["Id"] in place_ids
+        }
+        return legs, segments, carrier_codes, place_codes
+    
     def _parse_leg_segments(
         self, 
         leg: dict, 
         segments: dict, 
-        carriers: dict, 
-        places: dict
+        carrier_codes: dict, 
+        place_codes: dict
     ) -> List[FlightSegment]:
-        """Parse leg segments"""
-        parsed_segments = []
-        
-        for seg_id in leg.get("SegmentIds", []):
-            seg = segments.get(seg_id, {})
-            
-            origin_place = places.get(seg.get("OriginStation"), {})
-            dest_place = places.get(seg.get("DestinationStation"), {})
-            carrier = carriers.get(seg.get("Carrier"), {})
-            
-            try:
-                departure_time = datetime.fromisoformat(
-                    seg.get("DepartureDateTime", "").replace("Z", "+00:00")
-                )
-                arrival_time = datetime.fromisoformat(
-                    seg.get("ArrivalDateTime", "").replace("Z", "+00:00")
-                )
-            except:
-                departure_time = datetime.now()
-                arrival_time = datetime.now()
-            
-            parsed_segments.append(FlightSegment(
-                departure_airport=origin_place.get("Code", "XXX"),
-                arrival_airport=dest_place.get("Code", "XXX"),
-                departure_time=departure_time,
-                arrival_time=arrival_time,
-                flight_number=f"{carrier.get('Code', 'XX')}{seg.get('FlightNumber', '000')}",
-                airline=carrier.get("Code", "XX"),
-                duration_minutes=seg.get("Duration", 0),
-            ))
+        """Parse leg segments (carrier_codes/place_codes map Id -> IATA code)"""
+        segment = segments.get
+        parse_segment = self._parse_segment
+        return [
+            parse_segment(segment(seg_id, _EMPTY), carrier_codes, place_codes)
+            for seg_id in leg.get("SegmentIds", ())
+        ]
+    
+    def _parse_segment(self, seg: dict, carrier_codes: dict, place_codes: dict) -> FlightSegment:
+        """Parse a single segment"""
+        try:
+            departure_time = _parse_datetime(seg["DepartureDateTime"])
+            arrival_time = _parse_datetime(seg["ArrivalDateTime"])
+        except (KeyError, TypeError, ValueError):
+            departure_time = arrival_time = datetime.now()
         
-        return parsed_segments
+        carrier = carrier_codes.get(seg.get("Carrier"), "XX")
+        return FlightSegment(
+            departure_airport=place_codes.get(seg.get("OriginStation"), "XXX"),
+            arrival_airport=place_codes.get(seg.get("DestinationStation"), "XXX"),
+            departure_time=departure_time,
+            arrival_time=arrival_time,
+            flight_number=f"{carrier}{seg.get('FlightNumber', '000')}",
+            airline=carrier,
+            duration_minutes=seg.get("Duration", 0),
+        )
     
     async def get_price_calendar(
         self,
@@ -279,28 +378,20 @@ class SkyscannerProvider(FlightProvider):
             return []
         
         try:
-            headers = {
-                "X-RapidAPI-Key": settings.SKYSCANNER_API_KEY,
-                "X-RapidAPI-Host": self.RAPIDAPI_HOST,
-            }
+            response = await self._get_client().get(
+                f"{self.BASE_URL}/browsedates/v1.0/{self._market}/{self._currency}/{self._locale}/{origin}/{destination}/{year}-{month:02d}",
+            )
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/browsedates/v1.0/{self._market}/{self._currency}/{self._locale}/{origin}/{destination}/{year}-{month:02d}",
-                    headers=headers,
-                    timeout=30.0,
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return [
-                        {
-                            "date": quote.get("OutboundLeg", {}).get("DepartureDate", "").split("T")[0],
-                            "price": float(quote.get("MinPrice", 0)),
-                            "currency": self._currency,
-                        }
-                        for quote in data.get("Quotes", [])
-                    ]
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                return [
+                    {
+                        "date": quote.get("OutboundLeg", {}).get("DepartureDate", "").split("T")[0],
+                        "price": float(quote.get("MinPrice", 0)),
+                        "currency": self._currency,
+                    }
+                    for quote in data.get("Quotes", [])
+                ]
         except Exception as e:
             logger.warning(f"Skyscanner price calendar failed: {e}")
         
@@ -312,17 +403,10 @@ class SkyscannerProvider(FlightProvider):
             return False
         
         try:
-            headers = {
-                "X-RapidAPI-Key": settings.SKYSCANNER_API_KEY,
-                "X-RapidAPI-Host": self.RAPIDAPI_HOST,
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/reference/v1.0/currencies",
-                    headers=headers,
-                    timeout=10.0,
-                )
-                return response.status_code == 200
+            response = await self._get_client().get(
+                f"{self.BASE_URL}/reference/v1.0/currencies",
+                timeout=10.0,
+            )
+            return response.status_code == 200
         except Exception:
             return False
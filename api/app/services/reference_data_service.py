@@ -6,6 +6,7 @@ import httpx
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+from operator import attrgetter
 from tenacity import retry, stop_after_attempt, wait_exponential
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
@@ -471,7 +472,7 @@ class ReferenceDataSeeder:
                 for data in airlines_data.values()
             ]
             
-            cheapest = min(offers, key=lambda x: x.price)
+            cheapest = min(offers, key=attrgetter("price"))
             
             # Get city names from airports table
             origin_info = await self.db.execute(
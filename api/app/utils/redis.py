@@ -44,6 +44,22 @@ async def close_redis():
         logger.info("Redis connection closed")
 
 
+class NoOpPipeline:
+    """Pipeline counterpart of NoOpCache: queued commands all return None"""
+    def __init__(self):
+        self._queued = 0
+    
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs) -> "NoOpPipeline":
+            self._queued += 1
+            return self
+        return queue
+    
+    async def execute(self) -> list:
+        results, self._queued = [None] * self._queued, 0
+        return results
+
+
 class NoOpCache:
     """A no-op cache that does nothing - used when Redis is unavailable"""
     async def get(self, key: str) -> None:
@@ -63,6 +79,16 @@ class NoOpCache:
     
     async def keys(self, pattern: str) -> list:
         return []
+    
+    async def unlink(self, *keys: str) -> int:
+        return 0
+    
+    async def scan_iter(self, *args, **kwargs):
+        for key in ():
+            yield key
+    
+    def pipeline(self, *args, **kwargs) -> NoOpPipeline:
+        return NoOpPipeline()
 
 _noop_cache = NoOpCache()
 
@@ -120,12 +146,20 @@ class CacheService:
         """Delete key from cache"""
         return await self.client.delete(key) > 0
     
-    async def delete_pattern(self, pattern: str) -> int:
-        """Delete all keys matching pattern"""
-        keys = await self.client.keys(pattern)
-        if keys:
-            return await self.client.delete(*keys)
-        return 0
+    async def delete_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """Delete all keys matching pattern (SCAN + UNLINK, never KEYS)"""
+        deleted = 0
+        batch = []
+        
+        async for key in self.client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await self.client.unlink(*batch)
+                batch = []
+        
+        if batch:
+            deleted += await self.client.unlink(*batch)
+        return deleted
     
     async def exists(self, key: str) -> bool:
         """Check if key exists"""
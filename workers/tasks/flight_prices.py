@@ -4,6 +4,7 @@ Flight Price Update Tasks
 from celery import shared_task
 import httpx
 import logging
+import random
 from datetime import datetime, timedelta
 from typing import List
 
@@ -21,6 +22,12 @@ POPULAR_ROUTES = [
     ("LHR", "AMS"),  # London -> Amsterdam
 ]
 
+# Airlines quoted by the mock price fetcher
+MOCK_AIRLINES = ("Ryanair", "Aer Lingus", "Vueling", "EasyJet")
+
+# Dedicated RNG for mock prices (avoids the shared module-level random state)
+_mock_rng = random.Random()
+
 
 @shared_task(bind=True, max_retries=3)
 def update_popular_routes(self):
@@ -96,20 +103,16 @@ def _fetch_prices(origin: str, destination: str) -> List[dict]:
     """
     Fetch prices from flight APIs (mock implementation)
     """
-    import random
+    randint = _mock_rng.randint
     
-    airlines = ["Ryanair", "Aer Lingus", "Vueling", "EasyJet"]
-    prices = []
-    
-    for airline in airlines:
-        base_price = random.randint(30, 150)
-        prices.append({
+    return [
+        {
             "airline": airline,
-            "price": base_price + random.randint(-10, 30),
+            "price": randint(30, 150) + randint(-10, 30),
             "source": "mock",
-        })
-    
-    return prices
+        }
+        for airline in MOCK_AIRLINES
+    ]
 
 
 @shared_task